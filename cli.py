@@ -3,8 +3,7 @@ import shutil
 import argparse
 import traceback
 import json
-import tarfile
-import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
 from training import (
     PreprocessMethodEnum,
@@ -14,10 +13,25 @@ from training import (
     predict_package_MLP,
     predict_package_NB,
     predict_package_SVM,
-    predict_package_RF
+    predict_package_RF,
+    predict_packages,
+    predict_packages_with_probability,
+    iter_feature_batches
 )
 from conf import SETTINGS
-from feature_extract import extract_feature_from_package
+from feature_extract import (
+    extract_feature_from_package,
+    get_feature_by_package,
+    get_feature_by_archive,
+    save_feature,
+    get_package_name,
+    ArchiveLimitExceededError,
+    ScratchDirectory,
+    FeatureManifest,
+    decompress_archive,
+    save_manifest,
+    load_positions
+)
 
 
 def load_settings():
@@ -38,128 +52,177 @@ def load_settings():
         exit(1)
     return current_settings
 
-def add_mode(dir: str):
-    """
-    Check if the folder has read, write and execute permissions, if not, add them.
-    Check if the file has read and write permissions, if not, add them.
+def extract_package(file_path: str, package_path: str, package_name: str, feature_path: str, feature_position_path: str, file_workers: int = 1, verdict_only: bool = False) -> tuple:
+    """Extract features from a package archive, in a worker process.
 
     Args:
-        dir: Folder path.
+        file_path: Path of package archive.
+        package_path: Path of pinned package in scratch directory, None to read the archive in memory.
+        package_name: Name of package.
+        feature_path: Folder to save the feature file.
+        feature_position_path: Folder to save the feature position file.
+        file_workers: Number of worker processes to analyze the files of a large package with.
+        verdict_only: Only extract the features, without their positions.
+
+    Returns:
+        Path of feature position file, None if verdict_only is set, and the feature vector of the package.
     """
-    if not os.path.exists(dir):
-        return
-    for dirpath, dirnames, filenames in os.walk(dir):
-        for dirname in dirnames:
-            dir_path = os.path.join(dirpath, dirname)
-            if not os.access(dir_path, os.R_OK | os.W_OK | os.X_OK):
-                try:
-                    os.chmod(dir_path, 0o666)
-                except Exception:
-                    pass
-        for filename in filenames:
-            file_path = os.path.join(dirpath, filename)
-            if not os.access(file_path, os.R_OK | os.W_OK):
-                try:
-                    os.chmod(file_path, 0o666)
-                except Exception:
-                    pass
+    if package_path is None:
+        package_feature, position_recorder = get_feature_by_archive(file_path, file_workers, verdict_only)
+    else:
+        object_path = os.path.realpath(package_path)
+        if not os.path.isdir(object_path):
+            decompress_archive(file_path, object_path)
+        package_feature, position_recorder = get_feature_by_package(package_path, file_workers, verdict_only)
+    return save_feature(package_feature, position_recorder, package_name, feature_path, feature_position_path), package_feature.to_vector()
+
+def extract_dataset(dataset_name: str, scratch_directory: ScratchDirectory, verdict_only: bool, rebuild: bool, selected_file_names: set = None) -> FeatureManifest:
+    """Extract features from the new and the changed packages of a dataset.
 
-def decompress_packages(dataset_path: str, use_cache: bool = False) -> str:
-    """Decompress packages.
-    
     Args:
-        dataset_path: Path of dataset.
-        use_cache: Use cache or not.
+        dataset_name: Name of dataset.
+        scratch_directory: The scratch directory to decompress the packages in, None to read them in memory.
+        verdict_only: Only extract the features, without their positions.
+        rebuild: Re-extract all packages instead of only the new and the changed ones.
+        selected_file_names: The file names of the packages to extract, None for all packages.
 
     Returns:
-        Path of decompressed dataset.
+        The feature manifest of the dataset.
     """
-    temp_base_path = os.path.abspath(f'.decompressed-packages')
-    temp_dataset_path = os.path.abspath(os.path.join(temp_base_path, os.path.basename(dataset_path)))
-
-    if use_cache and os.path.exists(temp_dataset_path):
-        return temp_dataset_path
-    if os.path.exists(temp_dataset_path):
-        try:
-            shutil.rmtree(temp_dataset_path)
-        except PermissionError:
-            print(f'Error: Delete temp dataset folder {temp_dataset_path} failed.')
-            traceback.print_exc()
-            add_mode(temp_dataset_path)
-            shutil.rmtree(temp_dataset_path)
-    os.makedirs(temp_dataset_path)
-    dataset_names = os.listdir(dataset_path)
-    for counter, file_name in enumerate(dataset_names):
-        print(f'{counter + 1}/{len(dataset_names)}: Decompressing {file_name}...')
-        file_path = os.path.join(dataset_path, file_name)
-        try:
-            # decompress .tar.gz file
-            if file_name.endswith('.tar.gz'):
-                tar = tarfile.open(file_path)
-                temp_package_path = f'{temp_dataset_path}/{file_name[:-7]}'
-                os.makedirs(temp_package_path, exist_ok=True)
-                tar.extractall(path=temp_package_path)
-                tar.close()
-            # decompress .tgz file
-            elif file_name.endswith('.tgz'):
-                tar = tarfile.open(file_path)
-                temp_package_path = f'{temp_dataset_path}/{file_name[:-4]}'
-                os.makedirs(temp_package_path, exist_ok=True)
-                tar.extractall(path=temp_package_path)
-                tar.close()
-            # decompress .zip file
-            elif file_name.endswith('.zip'):
-                zip = zipfile.ZipFile(file_path)
-                temp_package_path = f'{temp_dataset_path}/{file_name[:-4]}'
-                os.makedirs(temp_package_path, exist_ok=True)
-                zip.extractall(path=temp_package_path)
-                zip.close()
-        except Exception:
-            print(f'Error: Decompress the package {file_name} failed.')
-            traceback.print_exc()
-    add_mode(temp_dataset_path)
-    return temp_dataset_path
-
-def extract_cli():
-    """Extract features from given dataset."""
-    dataset_names = args.dataset
     use_cache = args.cache
-    for dataset_name in dataset_names:
-        dataset_path = os.path.join(SETTINGS['path']['datasets'], dataset_name)
-        dataset_path = os.path.abspath(decompress_packages(dataset_path, use_cache))
-        if not os.path.exists(dataset_path):
-            print(f'Error: Dataset path {dataset_path} not found!')
-            exit(1)
-        feature_path = os.path.abspath(os.path.join(SETTINGS['path']['features'], dataset_name))
-        feature_position_path = os.path.abspath(os.path.join(SETTINGS['path']['feature-positions'], dataset_name))
+    in_memory = args.in_memory
+    workers = args.workers
+    file_workers = args.file_workers
+    dataset_path = os.path.abspath(os.path.join(SETTINGS['path']['datasets'], dataset_name))
+    if not os.path.exists(dataset_path):
+        print(f'Error: Dataset path {dataset_path} not found!')
+        exit(1)
+    feature_path = os.path.abspath(os.path.join(SETTINGS['path']['features'], dataset_name))
+    feature_position_path = os.path.abspath(os.path.join(SETTINGS['path']['feature-positions'], dataset_name))
+    feature_manifest = FeatureManifest(f'{feature_path}.manifest.json', feature_path, feature_position_path, verdict_only)
 
+    # without a manifest, the features of the dataset are rebuilt from scratch
+    if rebuild or not feature_manifest.entries:
+        feature_manifest.clear()
         if os.path.exists(feature_path):
             try:
                 shutil.rmtree(feature_path)
             except PermissionError:
                 print(f'Error: Delete feature folder {feature_path} failed.')
                 traceback.print_exc()
-        os.makedirs(feature_path)
-
         if os.path.exists(feature_position_path):
             try:
                 shutil.rmtree(feature_position_path)
             except PermissionError:
                 print(f'Error: Delete feature position folder {feature_path} failed.')
                 traceback.print_exc()
-        os.makedirs(feature_position_path)
-
-        counter = 0
-        length = len(os.listdir(dataset_path))
-        for file_name in os.listdir(dataset_path):
-            file_path = os.path.join(dataset_path, file_name)
-            try:
+    os.makedirs(feature_path, exist_ok=True)
+    os.makedirs(feature_position_path, exist_ok=True)
+
+    dataset_file_names = [file_name for file_name in os.listdir(dataset_path) if get_package_name(file_name) is not None]
+    removed_file_names = feature_manifest.prune(dataset_file_names)
+    if selected_file_names is not None:
+        dataset_file_names = [file_name for file_name in dataset_file_names if file_name in selected_file_names]
+    # only the new and the changed archives are extracted
+    file_names = [file_name for file_name in dataset_file_names if not feature_manifest.is_extracted(dataset_path, file_name)]
+    print(f'{dataset_name}: {len(dataset_file_names) - len(file_names)} packages unchanged, {len(removed_file_names)} removed, {len(file_names)} to extract.')
+    if not in_memory:
+        scratch_directory.prune(dataset_path)
+    counter = 0
+    futures = {}
+    remaining_file_names = iter(file_names)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            # keep a bounded number of packages in flight, so only those are pinned in the scratch directory
+            for file_name in remaining_file_names:
+                package_path = None
+                if not in_memory:
+                    try:
+                        package_path = scratch_directory.acquire(dataset_path, file_name, use_cache, feature_manifest.archives[file_name]['sha256'])
+                    except ArchiveLimitExceededError as e:
+                        counter += 1
+                        print(f'{counter}/{len(file_names)}: Skip: The package {file_name} has {e}.')
+                        feature_manifest.skip(file_name, str(e))
+                        continue
+                future = executor.submit(extract_package, os.path.join(dataset_path, file_name), package_path, get_package_name(file_name), feature_path, feature_position_path, file_workers, verdict_only)
+                futures[future] = (file_name, package_path)
+                if len(futures) >= 2 * workers:
+                    break
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                file_name, package_path = futures.pop(future)
                 counter += 1
-                print(f'{counter}/{length}: Extracting {file_name} ...')
-                extract_feature_from_package(file_path, file_name, feature_path, feature_position_path)
-            except Exception:
-                print(f'Error: {file_name}')
-                traceback.print_exc()
+                try:
+                    feature_manifest.add(file_name, *future.result())
+                    print(f'{counter}/{len(file_names)}: Extracted {get_package_name(file_name)}')
+                except ArchiveLimitExceededError as e:
+                    print(f'{counter}/{len(file_names)}: Skip: The package {file_name} has {e}.')
+                    feature_manifest.skip(file_name, str(e))
+                    if not in_memory:
+                        scratch_directory.skip(dataset_path, file_name, str(e))
+                except Exception:
+                    print(f'{counter}/{len(file_names)}: Error: {file_name}')
+                    traceback.print_exc()
+                    feature_manifest.remove(file_name)
+                finally:
+                    if not in_memory:
+                        scratch_directory.release(package_path)
+    if not in_memory:
+        scratch_directory.save()
+    feature_manifest.save()
+    save_manifest(feature_manifest.get_skipped_packages(), f'{feature_path}.skipped.json')
+    return feature_manifest
+
+def extract_cli():
+    """Extract features from given dataset."""
+    dataset_names = args.dataset
+    verdict_only = args.verdict_only
+    rebuild = args.rebuild
+    scratch_directory = None if args.in_memory else ScratchDirectory('.decompressed-packages', SETTINGS['extract']['max_scratch_bytes'])
+    for dataset_name in dataset_names:
+        extract_dataset(dataset_name, scratch_directory, verdict_only, rebuild)
+
+def scan_cli():
+    """Extract features from given dataset and predict, in two phases.
+
+    The first phase extracts the features of all packages without their positions and predicts the packages.
+    The second phase extracts the positions of the packages predicted malicious, or benign with a malicious
+    probability of at least the uncertain probability, with the same extraction as the extract command, so
+    their feature position files are identical to a full extraction.
+    """
+    dataset_names = args.dataset
+    model_name = args.model
+    rebuild = args.rebuild
+    uncertain_probability = args.uncertain_probability
+    batch_size = args.batch_size
+    scratch_directory = None if args.in_memory else ScratchDirectory('.decompressed-packages', SETTINGS['extract']['max_scratch_bytes'])
+    for dataset_name in dataset_names:
+        feature_path = os.path.abspath(os.path.join(SETTINGS['path']['features'], dataset_name))
+        feature_manifest = extract_dataset(dataset_name, scratch_directory, True, rebuild)
+        file_names = {get_package_name(file_name): file_name for file_name, entry in feature_manifest.entries.items() if 'skipped' not in entry}
+        predictions = {}
+        flagged_file_names = set()
+        for package_names, feature_matrix in iter_feature_batches(feature_path, batch_size):
+            results, probabilities = predict_packages_with_probability(model_name, feature_matrix)
+            for i, package_name in enumerate(package_names):
+                file_name = file_names[package_name]
+                predictions[file_name] = results[i]
+                if results[i] == 'malicious' or (probabilities is not None and uncertain_probability < 1 and probabilities[i] >= uncertain_probability):
+                    flagged_file_names.add(file_name)
+        print(f'{dataset_name}: {len(flagged_file_names)} of {len(predictions)} packages flagged.')
+        feature_manifest = extract_dataset(dataset_name, scratch_directory, False, False, flagged_file_names)
+
+        report_name = f'{dataset_name}-{model_name}-scan.csv'
+        report_content = 'package name, predict, feature positions\n'
+        for file_name, result in sorted(predictions.items()):
+            entry = feature_manifest.entries.get(file_name)
+            position_file = entry.get('position_file') if entry is not None and file_name in flagged_file_names else None
+            report_content += get_package_name(file_name) + ', ' + result + ', ' + (position_file or '') + '\n'
+
+        with open(os.path.join(SETTINGS['path']['reports'], report_name), 'w') as f:
+            f.write(report_content)
 
 def train_cli():
     """Train model with given dataset."""
@@ -221,25 +284,17 @@ def predict_cli():
     """Predict packages."""
     dataset_names = args.dataset
     model_name = args.model
+    batch_size = args.batch_size
 
     for dataset_name in dataset_names:
         report_name = f'{dataset_name}-{model_name}-report.csv'
-        report_content = 'package name, predict\n'
         csv_dir_path = os.path.join(SETTINGS['path']['features'], dataset_name)
-        for feature_file_name in os.listdir(csv_dir_path):
-            feature_file_path = os.path.join(csv_dir_path, feature_file_name)
-            if model_name == 'MLP':
-                result = predict_package_MLP(feature_file_path)
-            elif model_name == 'NB':
-                result = predict_package_NB(feature_file_path)
-            elif model_name == 'SVM':
-                result = predict_package_SVM(feature_file_path)
-            elif model_name == 'RF':
-                result = predict_package_RF(feature_file_path)
-            report_content += feature_file_name[:-4] + ', ' + result + '\n'
-
+        # the packages are predicted in batches, and their rows are written as soon as they are predicted
         with open(os.path.join(SETTINGS['path']['reports'], report_name), 'w') as f:
-            f.write(report_content)
+            f.write('package name, predict\n')
+            for package_names, feature_matrix in iter_feature_batches(csv_dir_path, batch_size):
+                results = predict_packages(model_name, feature_matrix)
+                f.writelines(f'{package_name}, {result}\n' for package_name, result in zip(package_names, results))
 
 def predict_single_package(package_path: str):
     """Extract features and predict from given path."""
@@ -258,12 +313,12 @@ def predict_single_package(package_path: str):
         traceback.print_exc()
 
     model_name = args.model
-    feature_positions_file_path = os.path.join(SETTINGS['path']['feature-positions'], f'{package_name}.json')
+    extension = '.json.gz' if SETTINGS['extract']['compress_positions'] else '.json'
+    feature_positions_file_path = os.path.join(SETTINGS['path']['feature-positions'], f'{package_name}{extension}')
     if not os.path.exists(feature_positions_file_path):
         print(f'Error: Feature positions file {feature_positions_file_path} not found!')
         exit(1)
-    with open(feature_positions_file_path, 'r') as f:
-        feature_positions = json.load(f)
+    feature_positions = load_positions(feature_positions_file_path)
 
     report_name = f'{package_name}-{model_name}.json'
     report_dir_path = os.path.join(SETTINGS['path']['features'])
@@ -284,6 +339,12 @@ def predict_single_package(package_path: str):
     with open(os.path.join(SETTINGS['path']['reports'], report_name), 'w') as f:
         f.write(report_content)
 
+def serve_cli():
+    """Serve the predictions of a model to local clients."""
+    # the server is only imported when serving
+    from scoring_server import serve
+    serve(args.model, args.host, args.port, args.socket, args.workers, args.file_workers, args.max_batch_size, args.max_batch_delay_ms / 1000, SETTINGS['serve']['max_request_bytes'])
+
 if __name__ == '__main__':
     settings = load_settings()
     DATASET_NAMES = [f for f in os.listdir(settings['path']['datasets']) if os.path.isdir(os.path.join(settings['path']['datasets'], f))]
@@ -299,6 +360,23 @@ if __name__ == '__main__':
     parser_extract = subparsers.add_parser('extract', help='extract features', description='Extract features from given dataset.')
     parser_extract.add_argument('-d', '--dataset', type=str, required=True, help='dataset name', choices=DATASET_NAMES, nargs='+')
     parser_extract.add_argument('-c', '--cache', type=bool, help='use cache or not', default=False)
+    parser_extract.add_argument('-w', '--workers', type=int, help='number of worker processes to decompress and extract packages with', default=1)
+    parser_extract.add_argument('-fw', '--file-workers', type=int, help='number of worker processes to analyze the files of a large package with', default=1)
+    parser_extract.add_argument('-m', '--in-memory', action='store_true', help='read packages from their archives in memory instead of decompressing them')
+    parser_extract.add_argument('-v', '--verdict-only', action='store_true', help='only extract the features for prediction, without their positions')
+    parser_extract.add_argument('-r', '--rebuild', action='store_true', help='re-extract all packages instead of only the new and the changed ones')
+
+    # scan CLI parameters
+    parser_scan = subparsers.add_parser('scan', help='extract features and predict, with positions of flagged packages only', description='Extract features from given dataset, predict the packages, and extract the feature positions of the flagged packages only.')
+    parser_scan.add_argument('-d', '--dataset', type=str, required=True, help='dataset name', choices=DATASET_NAMES, nargs='+')
+    parser_scan.add_argument('-o', '--model', type=str, required=True, help='model name', choices=MODEL_NAMES)
+    parser_scan.add_argument('-b', '--batch-size', type=int, help='number of packages to predict at once', default=settings['classifier']['predict_batch_size'])
+    parser_scan.add_argument('-u', '--uncertain-probability', type=float, help='malicious probability from which a package predicted benign is flagged too', default=settings['classifier']['uncertain_probability'])
+    parser_scan.add_argument('-c', '--cache', type=bool, help='use cache or not', default=False)
+    parser_scan.add_argument('-w', '--workers', type=int, help='number of worker processes to decompress and extract packages with', default=1)
+    parser_scan.add_argument('-fw', '--file-workers', type=int, help='number of worker processes to analyze the files of a large package with', default=1)
+    parser_scan.add_argument('-m', '--in-memory', action='store_true', help='read packages from their archives in memory instead of decompressing them')
+    parser_scan.add_argument('-r', '--rebuild', action='store_true', help='re-extract all packages instead of only the new and the changed ones')
 
     # train CLI parameters
     parser_train = subparsers.add_parser('train', help='train model', description='Train model with given dataset.')
@@ -331,14 +409,30 @@ if __name__ == '__main__':
     parser_predict.add_argument('-o', '--model', type=str, required=True, help='model name', choices=MODEL_NAMES)
     parser_predict.add_argument('-d', '--dataset', type=str, help='dataset name', choices=FEATURE_NAMES, nargs='+')
     parser_predict.add_argument('-p', '--package-path', type=str, help='absolute package path')
+    parser_predict.add_argument('-b', '--batch-size', type=int, help='number of packages to predict at once', default=settings['classifier']['predict_batch_size'])
+
+    # serve CLI parameters
+    parser_serve = subparsers.add_parser('serve', help='serve predictions', description='Extract features and predict packages sent by local clients, with the model kept in memory.')
+    parser_serve.add_argument('-o', '--model', type=str, required=True, help='model name', choices=MODEL_NAMES)
+    parser_serve.add_argument('--host', type=str, help='host to listen on', default=settings['serve']['host'])
+    parser_serve.add_argument('--port', type=int, help='port to listen on', default=settings['serve']['port'])
+    parser_serve.add_argument('-s', '--socket', type=str, help='unix socket to listen on instead of the host and the port')
+    parser_serve.add_argument('-w', '--workers', type=int, help='number of worker processes to extract packages with', default=1)
+    parser_serve.add_argument('-fw', '--file-workers', type=int, help='number of worker processes to analyze the files of a large package with', default=1)
+    parser_serve.add_argument('-b', '--max-batch-size', type=int, help='maximum number of packages to predict at once', default=settings['serve']['max_batch_size'])
+    parser_serve.add_argument('-bd', '--max-batch-delay-ms', type=float, help='maximum milliseconds to wait for more packages to predict at once', default=settings['serve']['max_batch_delay_ms'])
 
     args = parser.parse_args()
 
     subparser_name = args.subparser_name
     if subparser_name == 'extract':
         extract_cli()
+    elif subparser_name == 'scan':
+        scan_cli()
     elif subparser_name == 'train':
         train_cli()
+    elif subparser_name == 'serve':
+        serve_cli()
     elif subparser_name == 'predict':
         if args.package_path:
             predict_single_package(args.package_path)
@@ -1,3 +1,20 @@
-from .src.extract_feature import extract_feature_from_package
+from .src.extract_feature import extract_feature_from_package, extract_feature_from_archive, get_feature_by_package, get_feature_by_archive, save_feature
+from .src.archive_util import get_package_name, ArchiveLimitExceededError, decompress_archive, save_manifest
+from .src.scratch_directory import ScratchDirectory
+from .src.feature_manifest import FeatureManifest
+from .src.position_recorder import load_positions
 
-__all__ = ['extract_feature_from_package']
\ No newline at end of file
+__all__ = [
+    'extract_feature_from_package',
+    'extract_feature_from_archive',
+    'get_feature_by_package',
+    'get_feature_by_archive',
+    'save_feature',
+    'get_package_name',
+    'ArchiveLimitExceededError',
+    'decompress_archive',
+    'save_manifest',
+    'ScratchDirectory',
+    'FeatureManifest',
+    'load_positions'
+]
\ No newline at end of file
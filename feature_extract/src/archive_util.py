@@ -0,0 +1,262 @@
+import os
+import json
+import shutil
+import hashlib
+import posixpath
+import tarfile
+import zipfile
+
+from conf import SETTINGS
+
+
+# the members of an archive which are used by the feature extractor
+ANALYZED_FILE_EXTENSIONS = ('.py',)
+ANALYZED_FILE_NAMES = ('PKG-INFO', 'setup.cfg', 'pyproject.toml', 'requirements.txt')
+# the extraction filter of the tar members, on the python versions which have one (3.12, and the security releases of 3.8 to 3.11)
+TAR_EXTRACT_FILTER = {'filter': 'data'} if hasattr(tarfile, 'data_filter') else {}
+# the settings of the archive limits, see check_archive_limits()
+ARCHIVE_LIMIT_NAMES = ('max_member_number', 'max_uncompressed_bytes', 'max_compression_ratio')
+
+class ArchiveLimitExceededError(Exception):
+    """Raised when an archive exceeds the member number, size or compression ratio limits."""
+
+def get_package_name(archive_name: str) -> str:
+    """Get the package name of an archive, i.e. the archive name without its extension.
+
+    Args:
+        archive_name: The file name of the archive.
+
+    Returns:
+        The package name, or None if the archive format is not supported.
+    """
+    if archive_name.endswith('.tar.gz'):
+        return archive_name[:-7]
+    if archive_name.endswith('.tgz') or archive_name.endswith('.zip'):
+        return archive_name[:-4]
+    return None
+
+def normalize_member_name(member_name: str) -> str:
+    """Normalize the name of an archive member.
+
+    Args:
+        member_name: The name of the archive member.
+
+    Returns:
+        The normalized member name, relative to the archive root.
+    """
+    return posixpath.normpath(member_name.replace('\\', '/')).lstrip('/')
+
+def is_analyzed_member(member_name: str) -> bool:
+    """Check whether an archive member is used by the feature extractor.
+
+    Args:
+        member_name: The normalized name of the archive member.
+
+    Returns:
+        True if the member is a python file or a packaging file.
+    """
+    if member_name.startswith('../'):
+        return False
+    return member_name.endswith(ANALYZED_FILE_EXTENSIONS) or posixpath.basename(member_name) in ANALYZED_FILE_NAMES
+
+def get_archive_limits() -> dict:
+    """Get the archive limits of the settings, recorded with the skipped archives to retry them when they change.
+
+    Returns:
+        The maximum member number, uncompressed size and compression ratio of an archive.
+    """
+    limits = SETTINGS['extract']
+    return {limit_name: limits[limit_name] for limit_name in ARCHIVE_LIMIT_NAMES}
+
+def check_archive_limits(member_number: int, uncompressed_size: int, archive_size: int):
+    """Check the members read so far against the archive limits of the settings.
+
+    Args:
+        member_number: The number of members read so far.
+        uncompressed_size: The total uncompressed size of the members read so far.
+        archive_size: The size of the archive file.
+
+    Throws:
+        ArchiveLimitExceededError: If any limit is exceeded.
+    """
+    limits = SETTINGS['extract']
+    if member_number > limits['max_member_number']:
+        raise ArchiveLimitExceededError(f'more than {limits["max_member_number"]} members')
+    if uncompressed_size > limits['max_uncompressed_bytes']:
+        raise ArchiveLimitExceededError(f'more than {limits["max_uncompressed_bytes"]} uncompressed bytes')
+    if uncompressed_size > limits['max_compression_ratio'] * max(archive_size, 1):
+        raise ArchiveLimitExceededError(f'compression ratio higher than {limits["max_compression_ratio"]}')
+
+def iter_tar_members(archive: tarfile.TarFile, archive_size: int):
+    """Iterate the analyzed members of a tar archive while enforcing the archive limits.
+
+    Args:
+        archive: The opened tar archive.
+        archive_size: The size of the archive file.
+
+    Yields:
+        The normalized member name and the member.
+    """
+    member_number = 0
+    uncompressed_size = 0
+    for member in archive:
+        member_number += 1
+        uncompressed_size += member.size
+        check_archive_limits(member_number, uncompressed_size, archive_size)
+        if not member.isfile():
+            continue
+        member_name = normalize_member_name(member.name)
+        if is_analyzed_member(member_name):
+            yield member_name, member
+
+def iter_zip_members(archive: zipfile.ZipFile, archive_size: int):
+    """Iterate the analyzed members of a zip archive after checking the archive limits.
+
+    Args:
+        archive: The opened zip archive.
+        archive_size: The size of the archive file.
+
+    Yields:
+        The normalized member name and the member info.
+    """
+    infos = archive.infolist()
+    check_archive_limits(len(infos), sum(info.file_size for info in infos), archive_size)
+    for info in infos:
+        if info.is_dir():
+            continue
+        member_name = normalize_member_name(info.filename)
+        if is_analyzed_member(member_name):
+            yield member_name, info
+
+def iter_archive_members(archive_path: str):
+    """Iterate the analyzed members of an archive without extracting it.
+
+    The tar archives are read as a stream, so only one member is held in memory at a time.
+
+    Args:
+        archive_path: The path of the .tar.gz, .tgz or .zip archive.
+
+    Yields:
+        The normalized member name and the member content.
+
+    Throws:
+        ArchiveLimitExceededError: If the archive exceeds the archive limits.
+    """
+    archive_size = os.path.getsize(archive_path)
+    if archive_path.endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as archive:
+            for member_name, info in iter_zip_members(archive, archive_size):
+                yield member_name, archive.read(info)
+    else:
+        with tarfile.open(archive_path, mode='r|*') as archive:
+            for member_name, member in iter_tar_members(archive, archive_size):
+                yield member_name, archive.extractfile(member).read()
+
+def add_mode(dir: str):
+    """
+    Check if the folder has read, write and execute permissions, if not, add them.
+    Check if the file has read and write permissions, if not, add them.
+
+    Args:
+        dir: Folder path.
+    """
+    if not os.path.exists(dir):
+        return
+    for dirpath, dirnames, filenames in os.walk(dir):
+        for dirname in dirnames:
+            dir_path = os.path.join(dirpath, dirname)
+            if not os.access(dir_path, os.R_OK | os.W_OK | os.X_OK):
+                try:
+                    os.chmod(dir_path, 0o666)
+                except Exception:
+                    pass
+        for filename in filenames:
+            file_path = os.path.join(dirpath, filename)
+            if not os.access(file_path, os.R_OK | os.W_OK):
+                try:
+                    os.chmod(file_path, 0o666)
+                except Exception:
+                    pass
+
+def hash_file(file_path: str) -> str:
+    """Calculate the SHA-256 digest of a file.
+
+    Args:
+        file_path: The path of the file.
+
+    Returns:
+        The hex digest of the file content.
+    """
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def decompress_archive(archive_path: str, dest_path: str):
+    """Decompress an archive into a directory.
+
+    The archive is decompressed into a temporary sibling directory which is then renamed to the destination,
+    so a concurrent or interrupted decompression never leaves a partial directory behind.
+
+    Only the members used by the feature extractor are written.
+
+    Args:
+        archive_path: The path of the .tar.gz, .tgz or .zip archive.
+        dest_path: The directory to decompress the archive into.
+
+    Throws:
+        ArchiveLimitExceededError: If the archive exceeds the archive limits.
+    """
+    temp_path = f'{dest_path}.{os.getpid()}.tmp'
+    if os.path.exists(temp_path):
+        shutil.rmtree(temp_path)
+    os.makedirs(temp_path)
+    try:
+        archive_size = os.path.getsize(archive_path)
+        if archive_path.endswith('.zip'):
+            with zipfile.ZipFile(archive_path) as archive:
+                for member_name, info in iter_zip_members(archive, archive_size):
+                    info.filename = member_name
+                    archive.extract(info, path=temp_path)
+        else:
+            with tarfile.open(archive_path, mode='r|*') as archive:
+                for member_name, member in iter_tar_members(archive, archive_size):
+                    member.name = member_name
+                    archive.extract(member, path=temp_path, set_attrs=False, **TAR_EXTRACT_FILTER)
+        os.rename(temp_path, dest_path)
+    except OSError:
+        # another worker decompressed the same content first
+        shutil.rmtree(temp_path, ignore_errors=True)
+        if not os.path.isdir(dest_path):
+            raise
+    except Exception:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+
+def load_manifest(manifest_path: str) -> dict:
+    """Load a manifest file.
+
+    Args:
+        manifest_path: The path of the manifest file.
+
+    Returns:
+        The manifest, or an empty manifest if the file does not exist or is broken.
+    """
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return {}
+
+def save_manifest(manifest: dict, manifest_path: str):
+    """Save a manifest file atomically.
+
+    Args:
+        manifest: The manifest.
+        manifest_path: The path of the manifest file.
+    """
+    temp_path = f'{manifest_path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(temp_path, manifest_path)
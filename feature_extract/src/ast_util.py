@@ -1,11 +1,33 @@
-import ast
 import re
+import ast
 import base64
+import hashlib
+from collections import deque, OrderedDict
+
+from conf import SETTINGS
 
-from .package_feature import PackageFeature
-from .patterns import IP_PATTERN, BASE64_PATTERN, SENSITIVE_STRING_PATTERN, DOMAIN_PATTERN
-from .position_recorder import Record, PositionRecorder
+from .package_feature import PackageFeature, MERGED_FEATURE_NAMES
+from .source_util import open_source, decode_source
+from .position_recorder import PositionRecorder, NullPositionRecorder
+from .rules import (
+    Rule,
+    INCLUDE_BASE64_STRING,
+    INCLUDE_BYTE_STRING,
+    INCLUDE_DOMAIN,
+    INCLUDE_IP,
+    INCLUDE_SUSPICIOUS_STRING,
+    IMPORT_MODULE_RULES,
+    IMPORT_NAME_RULES,
+    CALL_NAME_RULES,
+    CALL_ATTRIBUTE_RULES,
+    INSTALL_SCRIPT_FEATURE_NAMES,
+    PY_FILE_FEATURE_NAMES
+)
+from .string_classifier import DOMAIN_STRING, BASE64_STRING, IP_STRING, SENSITIVE_STRING, classify_string
 
+# the features a file can still set in a package, only the features merged into the package features
+INSTALL_SCRIPT_PENDING_FEATURE_NAMES = tuple(feature_name for feature_name in INSTALL_SCRIPT_FEATURE_NAMES if feature_name in MERGED_FEATURE_NAMES)
+PY_FILE_PENDING_FEATURE_NAMES = tuple(feature_name for feature_name in PY_FILE_FEATURE_NAMES if feature_name in MERGED_FEATURE_NAMES)
 
 def get_ast_tree_by_file_path(filename: str):
     """Get the ast tree of a python file.
@@ -17,8 +39,8 @@ def get_ast_tree_by_file_path(filename: str):
     Returns:
         The ast tree of the python file.
     """
-    with open(filename, 'r') as f:
-        tree = ast.parse(f.read())
+    with open_source(filename) as data:
+        tree = ast.parse(decode_source(data))
     return tree
 
 def get_ast_tree_by_content(content: str):
@@ -33,21 +55,22 @@ def get_ast_tree_by_content(content: str):
     tree = ast.parse(content)
     return tree
 
-def get_feature_by_file_path(file_path: str, is_in_setup_py: bool=False, position_recorder: PositionRecorder=None) -> PackageFeature:
+def get_feature_by_file_path(file_path: str, is_in_setup_py: bool=False, position_recorder: PositionRecorder=None, pending_feature_names: list=None) -> PackageFeature:
     """Get the feature of a python file.
 
     Args:
         filename: The path of the python file.
         is_in_setup_py: Whether the file is in setup.py.
         position_recorder: The position recorder.
+        pending_feature_names: The features which are not set yet, see get_feature_by_ast().
 
     Returns:
         The feature of the python file.
     """
     tree = get_ast_tree_by_file_path(file_path)
-    return get_feature_by_ast(tree, is_in_setup_py, position_recorder, file_path)
+    return get_feature_by_ast(tree, is_in_setup_py, position_recorder, file_path, pending_feature_names)
 
-def get_feature_by_content(content: str, is_in_setup_py: bool=False, position_recorder: PositionRecorder=None, file_path: str='') -> PackageFeature:
+def get_feature_by_content(content: str, is_in_setup_py: bool=False, position_recorder: PositionRecorder=None, file_path: str='', pending_feature_names: list=None, payload_budget: 'PayloadBudget'=None) -> PackageFeature:
     """Get the feature of a python code.
 
     Args:
@@ -55,246 +78,238 @@ def get_feature_by_content(content: str, is_in_setup_py: bool=False, position_re
         is_in_setup_py: Whether the file is in setup.py.
         position_recorder: The position recorder.
         file_path: The path of the python code file.
+        pending_feature_names: The features which are not set yet, see get_feature_by_ast().
+        payload_budget: The budget of the base64 payloads, see get_feature_by_ast().
 
     Returns:
         The feature of the python code.
     """
     tree = get_ast_tree_by_content(content)
-    return get_feature_by_ast(tree, is_in_setup_py, position_recorder, file_path)
+    return get_feature_by_ast(tree, is_in_setup_py, position_recorder, file_path, pending_feature_names, payload_budget)
+
+# fields which never hold a node with a feature, skipped when walking the ast tree
+SKIPPED_FIELDS = frozenset(['ctx', 'op', 'ops', 'id', 'attr', 'arg', 'name', 'asname', 'module', 'level', 'kind', 'type_comment', 'conversion', 'is_async'])
+# node class -> fields to walk into, filled lazily
+CHILD_FIELDS = {}
+
+def add_feature(package_feature: PackageFeature, position_recorder: PositionRecorder, rule: Rule, is_in_setup_py: bool, node, file_path: str):
+    """Set the feature of a matched rule and record the position of the node.
+
+    Args:
+        package_feature: The feature of the python code.
+        position_recorder: The position recorder.
+        rule: The matched rule.
+        is_in_setup_py: Whether the file is in setup.py.
+        node: The matched ast node.
+        file_path: The path of the python code file.
+    """
+    feature_name = rule.get_feature_name(is_in_setup_py)
+    package_feature.set_feature(feature_name)
+    record_feature(position_recorder, feature_name, node, file_path)
+
+def record_feature(position_recorder: PositionRecorder, feature_name: str, node, file_path: str):
+    """Record the position of a node with a feature.
+
+    Args:
+        position_recorder: The position recorder.
+        feature_name: The name of the feature.
+        node: The ast node.
+        file_path: The path of the python code file.
+    """
+    if position_recorder.enabled:
+        position_recorder.add_record(feature_name, file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset)
+
+def visit_import(node, package_feature: PackageFeature, is_in_setup_py: bool, position_recorder: PositionRecorder, file_path: str, payload_budget: 'PayloadBudget'):
+    found = False
+    for alias in node.names:
+        rule = IMPORT_MODULE_RULES.get(alias.name.partition('.')[0]) or IMPORT_NAME_RULES.get(alias.name)
+        if rule is not None:
+            add_feature(package_feature, position_recorder, rule, is_in_setup_py, node, file_path)
+            found = True
+    return found
+
+def visit_import_from(node, package_feature: PackageFeature, is_in_setup_py: bool, position_recorder: PositionRecorder, file_path: str, payload_budget: 'PayloadBudget'):
+    if node.module is None:
+        return False
+    rule = IMPORT_MODULE_RULES.get(node.module.partition('.')[0])
+    if rule is None:
+        return False
+    add_feature(package_feature, position_recorder, rule, is_in_setup_py, node, file_path)
+    return True
+
+def visit_call(node, package_feature: PackageFeature, is_in_setup_py: bool, position_recorder: PositionRecorder, file_path: str, payload_budget: 'PayloadBudget'):
+    func = node.func
+    func_type = type(func)
+    if func_type is ast.Name: # open, read, write, eval, exec
+        rule = CALL_NAME_RULES.get(func.id)
+    elif func_type is ast.Attribute and type(func.value) is ast.Name: # os.system, subprocess.call, base64.b64decode
+        rule = CALL_ATTRIBUTE_RULES.get((func.value.id, func.attr))
+    else:
+        return False
+    if rule is None:
+        return False
+    add_feature(package_feature, position_recorder, rule, is_in_setup_py, node, file_path)
+    return True
 
-def get_feature_by_ast(tree, is_in_setup_py: bool=False, position_recorder: PositionRecorder=None, file_path: str='') -> PackageFeature:
+def visit_constant(node, package_feature: PackageFeature, is_in_setup_py: bool, position_recorder: PositionRecorder, file_path: str, payload_budget: 'PayloadBudget'):
+    value = node.value
+    value_type = type(value)
+    if value_type is str:
+        if len(value) > package_feature.longest_string_length:
+            package_feature.longest_string_length = len(value)
+        categories = classify_string(value)
+        if not categories:
+            return False
+        # check if the string contains domain
+        if categories & DOMAIN_STRING:
+            add_feature(package_feature, position_recorder, INCLUDE_DOMAIN, is_in_setup_py, node, file_path)
+        # check if the string contains base64 string
+        if categories & BASE64_STRING:
+            try:
+                base64_bytes = base64.b64decode(value)
+            except:
+                return categories & DOMAIN_STRING != 0
+            add_feature(package_feature, position_recorder, INCLUDE_BASE64_STRING, is_in_setup_py, node, file_path)
+            # the features of the decoded payload are recorded at the position of the string
+            payload_feature = get_payload_feature(base64_bytes, is_in_setup_py, payload_budget)
+            if payload_feature is not None:
+                package_feature.merge(payload_feature)
+                base64_feature_name = INCLUDE_BASE64_STRING.get_feature_name(is_in_setup_py)
+                for feature_name in INSTALL_SCRIPT_FEATURE_NAMES if is_in_setup_py else PY_FILE_FEATURE_NAMES:
+                    if feature_name != base64_feature_name and payload_feature.has_feature(feature_name) and package_feature.has_feature(feature_name):
+                        record_feature(position_recorder, feature_name, node, file_path)
+        # check if the string contains ip string
+        if categories & IP_STRING:
+            add_feature(package_feature, position_recorder, INCLUDE_IP, is_in_setup_py, node, file_path)
+        # check if the string contains suspicious string
+        if categories & SENSITIVE_STRING:
+            add_feature(package_feature, position_recorder, INCLUDE_SUSPICIOUS_STRING, is_in_setup_py, node, file_path)
+        return True
+    if value_type is bytes:
+        add_feature(package_feature, position_recorder, INCLUDE_BYTE_STRING, is_in_setup_py, node, file_path)
+        return True
+    return False
+
+# node class -> visitor, which returns whether it found a feature
+NODE_VISITORS = {
+    ast.Import: visit_import,
+    ast.ImportFrom: visit_import_from,
+    ast.Call: visit_call,
+    ast.Constant: visit_constant,
+}
+
+# characters which are not in python code, to reject binary payloads before parsing them
+CONTROL_CHARACTER_REGEX = re.compile(r'[\x00-\x08\x0b\x0e-\x1f\x7f]')
+# (payload digest, is_in_setup_py, depth) -> features of the payload, in least recently used order
+PAYLOAD_FEATURES = OrderedDict()
+MAX_PAYLOAD_FEATURE_NUMBER = 1024
+
+class PayloadBudget:
+    """The budget of the base64 payloads decoded and analyzed in a python file."""
+    def __init__(self):
+        self.depth = 0
+        self.remaining_bytes = SETTINGS['extract']['max_payload_bytes']
+        # whether a payload was left out for exceeding the budget
+        self.exceeded = False
+
+def get_payload_feature(payload: bytes, is_in_setup_py: bool, payload_budget: PayloadBudget) -> PackageFeature:
+    """Get the features of a decoded base64 payload which contains python code.
+
+    A payload is only analyzed within the nesting depth and the byte budget of the file. The features of
+    the payloads are memoized by their digest, so a payload repeated in a file or across files is parsed once.
+    A memoized payload still counts against the byte budget, so the features of a file do not depend on the
+    files analyzed before it.
+
+    Args:
+        payload: The decoded payload.
+        is_in_setup_py: Whether the payload is in setup.py.
+        payload_budget: The budget of the payloads of the file.
+
+    Returns:
+        The features of the payload, or None if the payload is not analyzed or is not python code.
+    """
+    if payload_budget.depth >= SETTINGS['extract']['max_payload_depth']:
+        return None
+    if len(payload) > payload_budget.remaining_bytes:
+        payload_budget.exceeded = True
+        return None
+    payload_budget.remaining_bytes -= len(payload)
+    key = (hashlib.sha256(payload).digest(), is_in_setup_py, payload_budget.depth)
+    if key in PAYLOAD_FEATURES:
+        PAYLOAD_FEATURES.move_to_end(key)
+        return PAYLOAD_FEATURES[key]
+    payload_feature = None
+    exceeded = payload_budget.exceeded
+    payload_budget.exceeded = False
+    try:
+        content = payload.decode()
+        if content.strip() and not CONTROL_CHARACTER_REGEX.search(content):
+            payload_budget.depth += 1
+            try:
+                payload_feature = get_feature_by_content(content, is_in_setup_py, NullPositionRecorder(), payload_budget=payload_budget)
+            finally:
+                payload_budget.depth -= 1
+    except Exception:
+        pass
+    # the features of a payload with nested payloads left out depend on the budget, so they are not memoized
+    if not payload_budget.exceeded:
+        PAYLOAD_FEATURES[key] = payload_feature
+        if len(PAYLOAD_FEATURES) > MAX_PAYLOAD_FEATURE_NUMBER:
+            PAYLOAD_FEATURES.popitem(last=False)
+    payload_budget.exceeded = payload_budget.exceeded or exceeded
+    return payload_feature
+
+def get_pending_feature_names(package_feature: PackageFeature, is_in_setup_py: bool) -> list:
+    """Get the features which a python file can still set in a package.
+
+    Args:
+        package_feature: The features of the package found so far.
+        is_in_setup_py: Whether the file is setup.py.
+
+    Returns:
+        The names of the features the rules can set in the file which are not set yet. The features which
+        are not merged into the package features, see MERGED_FEATURE_MASK, are never pending.
+    """
+    feature_names = INSTALL_SCRIPT_PENDING_FEATURE_NAMES if is_in_setup_py else PY_FILE_PENDING_FEATURE_NAMES
+    return [feature_name for feature_name in feature_names if not package_feature.has_feature(feature_name)]
+
+def get_feature_by_ast(tree, is_in_setup_py: bool=False, position_recorder: PositionRecorder=None, file_path: str='', pending_feature_names: list=None, payload_budget: 'PayloadBudget'=None) -> PackageFeature:
     """Get the feature of a python ast tree.
 
+    The nodes are visited in the same breadth first order as ast.walk(), and dispatched by their class
+    to the visitors, which look the rules up by module and function names.
+
     Args:
         tree: The ast tree of the python code.
         is_in_setup_py: Whether the file is in setup.py.
         position_recorder: The position recorder.
+        file_path: The path of the python code file.
+        pending_feature_names: The features which are not set yet, see get_pending_feature_names(). When
+            given, the walk stops as soon as all of them are set, and longest_string_length may be incomplete.
+        payload_budget: The budget of the base64 payloads, shared with the payloads nested in the code.
 
     Returns:
         The feature of the python code.
     """
+    if payload_budget is None:
+        payload_budget = PayloadBudget()
     package_feature = PackageFeature()
-    for node in ast.walk(tree):
-        t = type(node).__name__
-        if t == 'Import':
-            for alias in node.names:
-                dot_index = alias.name.find('.')
-                if dot_index != -1:
-                    module_name = alias.name[:dot_index]
-                else:
-                    module_name = alias.name
-                if module_name == 'base64':
-                    if is_in_setup_py:
-                        package_feature.use_base64_conversion_in_install_script = 'true'
-                        position_recorder.add_record('use_base64_conversion_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.use_base64_conversion_in_py_file = 'true'
-                        position_recorder.add_record('use_base64_conversion_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                elif module_name == 'os' or module_name == 'shutil' or module_name == 'tempfile' or module_name == 'glob' or module_name == 'pathlib':
-                    if is_in_setup_py:
-                        package_feature.use_fs_in_install_script = 'true'
-                        position_recorder.add_record('use_fs_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.use_fs_in_py_file = 'true'
-                        position_recorder.add_record('use_fs_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                elif module_name == 'subprocess':
-                    if is_in_setup_py:
-                        package_feature.use_process_in_install_script = 'true'
-                        position_recorder.add_record('use_process_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.use_process_in_py_file = 'true'
-                        position_recorder.add_record('use_process_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                elif module_name == 'httplib' or module_name == 'urllib' or module_name == 'urllib2' or alias.name == 'http.client' or module_name == 'socket' or module_name == 'requests' or module_name == 'aiohttp' or module_name == 'selenium':
-                    if is_in_setup_py:
-                        package_feature.use_network_in_install_script = 'true'
-                        position_recorder.add_record('use_network_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.use_network_in_py_file = 'true'
-                        position_recorder.add_record('use_network_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                elif alias.name == 'dns.resolver':
-                    if is_in_setup_py:
-                        package_feature.include_domain_in_install_script = 'true'
-                        position_recorder.add_record('include_domain_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.include_domain_in_py_file = 'true'
-                        position_recorder.add_record('include_domain_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                elif module_name == 'zlib' or module_name == 'gzip' or module_name == 'bz2' or module_name == 'tarfile':
-                    if is_in_setup_py:
-                        package_feature.use_crypto_and_zip_in_install_script = 'true'
-                        position_recorder.add_record('use_crypto_and_zip_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.use_crypto_and_zip_in_py_file = 'true'
-                        position_recorder.add_record('use_crypto_and_zip_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-        elif t == 'ImportFrom':
-            if node.module == None:
-                continue
-            dot_index = node.module.find('.')
-            if dot_index != -1:
-                module_name = node.module[:dot_index]
-            else:
-                module_name = node.module
-            if module_name == 'base64':
-                if is_in_setup_py:
-                    package_feature.use_base64_conversion_in_install_script = 'true'
-                    position_recorder.add_record('use_base64_conversion_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                else:
-                    package_feature.use_base64_conversion_in_py_file = 'true'
-                    position_recorder.add_record('use_base64_conversion_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-            elif module_name == 'os' or module_name == 'shutil' or module_name == 'tempfile' or module_name == 'glob' or module_name == 'pathlib':
-                if is_in_setup_py:
-                    package_feature.use_fs_in_install_script = 'true'
-                    position_recorder.add_record('use_fs_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                else:
-                    package_feature.use_fs_in_py_file = 'true'
-                    position_recorder.add_record('use_fs_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-            elif module_name == 'subprocess':
-                if is_in_setup_py:
-                    package_feature.use_process_in_install_script = 'true'
-                    position_recorder.add_record('use_process_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                else:
-                    package_feature.use_process_in_py_file = 'true'
-                    position_recorder.add_record('use_process_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-            elif module_name == 'httplib' or module_name == 'urllib' or module_name == 'urllib2' or (node.module == 'http' and 'client' in node.names) or module_name == 'socket' or module_name == 'requests' or module_name == 'aiohttp' or module_name == 'selenium':
-                if is_in_setup_py:
-                    package_feature.use_network_in_install_script = 'true'
-                    position_recorder.add_record('use_network_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                else:
-                    package_feature.use_network_in_py_file = 'true'
-                    position_recorder.add_record('use_network_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-            elif node.module == 'dns' and 'resolver' in node.names:
-                if is_in_setup_py:
-                    package_feature.include_domain_in_install_script = 'true'
-                    position_recorder.add_record('include_domain_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                else:
-                    package_feature.include_domain_in_py_file = 'true'
-                    position_recorder.add_record('include_domain_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-            elif module_name == 'zlib' or module_name == 'gzip' or module_name == 'bz2' or module_name == 'tarfile':
-                if is_in_setup_py:
-                    package_feature.use_crypto_and_zip_in_install_script = 'true'
-                    position_recorder.add_record('use_crypto_and_zip_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                else:
-                    package_feature.use_crypto_and_zip_in_py_file = 'true'
-                    position_recorder.add_record('use_crypto_and_zip_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-        elif t == 'Call':
-            if type(node.func).__name__ == 'Name': # open, read, write, eval, exec
-                if node.func.id in ['open', 'read', 'write']:
-                    if is_in_setup_py:
-                        package_feature.use_fs_in_install_script = 'true'
-                        position_recorder.add_record('use_fs_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.use_fs_in_py_file = 'true'
-                        position_recorder.add_record('use_fs_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                if node.func.id == 'eval':
-                    if is_in_setup_py:
-                        package_feature.use_eval_in_install_script = 'true'
-                        position_recorder.add_record('use_eval_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.use_eval_in_py_file = 'true'
-                        position_recorder.add_record('use_eval_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                elif node.func.id == 'exec':
-                    if is_in_setup_py:
-                        package_feature.use_exec_in_install_script = 'true'
-                        position_recorder.add_record('use_exec_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.use_exec_in_py_file = 'true'
-                        position_recorder.add_record('use_exec_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                elif node.func.id == '__pyarmor__':
-                    if is_in_setup_py:
-                        package_feature.use_obfuscation_in_install_script = 'true'
-                        position_recorder.add_record('use_obfuscation_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.use_obfuscation_in_py_file = 'true'
-                        position_recorder.add_record('use_obfuscation_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-            elif type(node.func).__name__ == 'Attribute':
-                if type(node.func.value).__name__ == 'Name': # os
-                    if node.func.value.id == 'os':  # os.system, os.exec*, os.popen, os.spawn*, os.*env
-                        if node.func.attr in [
-                            'system',
-                            'execl', 'execle', 'execlp', 'execlpe', 'execv', 'execvp', 'execvpe',
-                            'popen',
-                            'spawnl', 'spawnle', 'spawnlp', 'spawnlpe', 'spawnv', 'spawnve', 'spawnvp', 'spawnvpe'
-                        ]:
-                            if is_in_setup_py:
-                                package_feature.use_process_in_install_script = 'true'
-                                position_recorder.add_record('use_process_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                            else:
-                                package_feature.use_operating_system_in_py_file = 'true'
-                                position_recorder.add_record('use_operating_system_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                        elif node.func.attr in [
-                            'getenv', 'putenv', 'unsetenv'
-                        ]:
-                            if is_in_setup_py:
-                                package_feature.use_env_in_install_script = 'true'
-                                position_recorder.add_record('use_env_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                            else:
-                                package_feature.use_env_in_py_file = 'true'
-                                position_recorder.add_record('use_env_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    elif node.func.value.id == 'subprocess' and node.func.attr in [
-                        'call', 'check_call', 'check_output', 'run', 'getoutput', 'getstatusoutput'
-                    ]:
-                        if is_in_setup_py:
-                            package_feature.use_process_in_install_script = 'true'
-                            position_recorder.add_record('use_process_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                        else:
-                            package_feature.use_process_in_py_file = 'true'
-                            position_recorder.add_record('use_process_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    elif node.func.value.id == 'base64':
-                        if node.func.attr == 'b64decode':
-                            if is_in_setup_py:
-                                package_feature.decode_base64_string_in_install_script = 'true'
-                                position_recorder.add_record('decode_base64_string_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                            else:
-                                package_feature.decode_base64_string_in_py_file = 'true'
-                                position_recorder.add_record('decode_base64_string_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-        elif t == 'Constant':
-            if type(node.value).__name__ == 'str':
-                if len(node.value) > package_feature.longest_string_length:
-                    package_feature.longest_string_length = len(node.value)
-                # check if the string contains domain
-                if re.search(DOMAIN_PATTERN, node.value):
-                    if is_in_setup_py:
-                        package_feature.include_domain_in_install_script = 'true'
-                        position_recorder.add_record('include_domain_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.include_domain_in_py_file = 'true'
-                        position_recorder.add_record('include_domain_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                # check if the string contains base64 string
-                if re.search(BASE64_PATTERN, node.value):
-                    try:
-                        base64_bytes = base64.b64decode(node.value)
-                    except:
-                        continue
-
-                    if is_in_setup_py:
-                        package_feature.include_base64_string_in_install_script = 'true'
-                        position_recorder.add_record('include_base64_string_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.include_base64_string_in_py_file = 'true'
-                        position_recorder.add_record('include_base64_string_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-
-                    try:
-                        base64_content = base64_bytes.decode()
-                        base64_content_features = get_feature_by_content(base64_content, is_in_setup_py)
-                        package_feature.merge(base64_content_features)
-                    except:
-                        pass
-                # check if the string contains ip string
-                if re.search(IP_PATTERN, node.value):
-                    if is_in_setup_py:
-                        package_feature.include_ip_in_install_script = 'true'
-                        position_recorder.add_record('include_ip_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.include_ip_in_py_file = 'true'
-                        position_recorder.add_record('include_ip_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                # check if the string contains suspicious string
-                if re.search(SENSITIVE_STRING_PATTERN, node.value):
-                    if is_in_setup_py:
-                        package_feature.include_suspicious_string_in_install_script = 'true'
-                        position_recorder.add_record('include_suspicious_string_in_install_script', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-                    else:
-                        package_feature.include_suspicious_string_in_py_file = 'true'
-                        position_recorder.add_record('include_suspicious_string_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
-            elif type(node.value).__name__ == 'bytes':
-                package_feature.include_byte_string_in_py_file = 'true'
-                position_recorder.add_record('include_byte_string_in_py_file', Record(file_path, node.lineno, node.col_offset, node.end_lineno, node.end_col_offset))
+    nodes = deque([tree])
+    while nodes:
+        node = nodes.popleft()
+        node_type = type(node)
+        visitor = NODE_VISITORS.get(node_type)
+        if visitor is not None and visitor(node, package_feature, is_in_setup_py, position_recorder, file_path, payload_budget) and pending_feature_names is not None:
+            pending_feature_names = [feature_name for feature_name in pending_feature_names if not package_feature.has_feature(feature_name)]
+            if not pending_feature_names:
+                break
+        child_fields = CHILD_FIELDS.get(node_type)
+        if child_fields is None:
+            child_fields = CHILD_FIELDS[node_type] = tuple(field for field in node_type._fields if field not in SKIPPED_FIELDS)
+        for field in child_fields:
+            value = getattr(node, field, None)
+            if isinstance(value, ast.AST):
+                nodes.append(value)
+            elif type(value) is list:
+                nodes.extend(item for item in value if isinstance(item, ast.AST))
     return package_feature
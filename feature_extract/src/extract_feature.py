@@ -1,15 +1,27 @@
 import os
 import csv
+from functools import partial
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
 
-from pkginfo import UnpackedSDist
+from pkginfo import Distribution, UnpackedSDist
 
-from .ast_util import get_feature_by_file_path
+from conf import SETTINGS
+
+from .archive_util import iter_archive_members
+from .source_util import open_source, decode_source_or_utf8
+from .ast_util import get_feature_by_content, get_pending_feature_names
+from .token_util import get_feature_by_tokens
+from .prefilter import get_prefiltered_feature
 from .package_feature import PackageFeature
-from .statistical_util import calculate_entropy_from_file, calculate_compression_ratio_from_file
-from .position_recorder import PositionRecorder
+from .statistical_util import calculate_entropy, calculate_compression_ratio
+from .position_recorder import PositionRecorder, NullPositionRecorder
+from .feature_cache import get_feature_cache
 
+# the errors of a file which can never be decoded or parsed, the other errors may not happen again
+UNANALYZABLE_FILE_ERRORS = (SyntaxError, ValueError, RecursionError)
 
-def extract_feature_from_package(package_path: str, feature_file_name: str, feature_file_dir: str, feature_position_file_dir: str)->str:
+def extract_feature_from_package(package_path: str, feature_file_name: str, feature_file_dir: str, feature_position_file_dir: str, file_workers: int=1, verdict_only: bool=False)->str:
     """Extract features from a package.
     
     Args:
@@ -17,9 +29,26 @@ def extract_feature_from_package(package_path: str, feature_file_name: str, feat
         feature_file_name: The name of the feature file and the feature position file.
         feature_file_dir: The directory to save the feature file.
         feature_position_file_dir: The directory to save the feature position file.
+        file_workers: The number of worker processes to analyze the files of a large package with.
+        verdict_only: Only extract the features, without their positions, skipping the files and the nodes
+            which can no longer change the features.
 
     Returns:
-        The path of the feature file.
+        The path of the feature position file, None if verdict_only is set.
+    """
+    package_feature, position_recorder = get_feature_by_package(package_path, file_workers, verdict_only)
+    return save_feature(package_feature, position_recorder, feature_file_name, feature_file_dir, feature_position_file_dir)
+
+def get_feature_by_package(package_path: str, file_workers: int=1, verdict_only: bool=False) -> tuple:
+    """Get the features of a package, see extract_feature_from_package().
+
+    Args:
+        package_path: The path of the package.
+        file_workers: The number of worker processes to analyze the files of a large package with.
+        verdict_only: Only extract the features, without their positions.
+
+    Returns:
+        The features and the feature positions of the package.
     """
     # 1. get all file paths in the package
     file_paths = []
@@ -30,79 +59,241 @@ def extract_feature_from_package(package_path: str, feature_file_name: str, feat
                 file_paths.append(os.path.join(root, file_name))
         if setup_path is None and 'setup.py' in file_names:
             setup_path = os.path.join(root, 'setup.py')
-    # 2. extract features from each file
     package_feature = PackageFeature()
-    position_recorder = PositionRecorder()
-    for file_path in file_paths:
-        file_name = os.path.basename(file_path)
-        try:
-            package_feature_temp = get_feature_by_file_path(file_path, file_name == 'setup.py', position_recorder)
-            package_feature.merge(package_feature_temp)
-        except Exception:
-            pass
-    # 3. extract package metadata
+    position_recorder = NullPositionRecorder() if verdict_only else PositionRecorder()
+    # setup.py is read once for its features and its statistical features
+    with open_source(setup_path) if setup_path else nullcontext() as setup_data:
+        # 2. extract features from each file
+        files = [(file_path, setup_data if file_path == setup_path else None) for file_path in file_paths]
+        extract_feature_from_files(files, package_feature, position_recorder, file_workers)
+        # 3. extract statistical features
+        if setup_path:
+            package_feature.entropy = calculate_entropy(decode_source_or_utf8(setup_data))
+            package_feature.compression_ratio = calculate_compression_ratio(setup_data)
+    # 4. extract package metadata
     try:
-        package_metadata = UnpackedSDist(package_path)
-        if package_metadata.author is not None:
-            package_feature.exist_author = 'true'
-        if package_metadata.home_page is not None:
-            package_feature.exist_home_page = 'true'
-            if package_metadata.name in package_metadata.home_page:
-                package_feature.is_package_name_in_home_page = 'true'
-        if package_metadata.license is not None and package_metadata.license.lower() != 'unlicense':
-            package_feature.exist_license = 'true'
+        extract_metadata_feature(UnpackedSDist(package_path), package_feature)
     except Exception:
         pass
-    # 4. extract statistical features
-    if setup_path:
-        package_feature.entropy = calculate_entropy_from_file(setup_path)
-        package_feature.compression_ratio = calculate_compression_ratio_from_file(setup_path)
-    # 5. save the features
+    return package_feature, position_recorder
+
+def extract_feature_from_archive(archive_path: str, feature_file_name: str, feature_file_dir: str, feature_position_file_dir: str, file_workers: int=1, verdict_only: bool=False)->str:
+    """Extract features from a package archive without decompressing it to disk.
+
+    The python files and the metadata are read from the archive members in memory. The file paths in
+    the feature positions are the member names relative to the archive root.
+
+    Args:
+        archive_path: The path of the .tar.gz, .tgz or .zip archive.
+        feature_file_name: The name of the feature file and the feature position file.
+        feature_file_dir: The directory to save the feature file.
+        feature_position_file_dir: The directory to save the feature position file.
+        file_workers: The number of worker processes to analyze the files of a large package with.
+        verdict_only: Only extract the features, without their positions, skipping the files and the nodes
+            which can no longer change the features.
+
+    Returns:
+        The path of the feature position file, None if verdict_only is set.
+    """
+    package_feature, position_recorder = get_feature_by_archive(archive_path, file_workers, verdict_only)
+    return save_feature(package_feature, position_recorder, feature_file_name, feature_file_dir, feature_position_file_dir)
+
+def get_feature_by_archive(archive_path: str, file_workers: int=1, verdict_only: bool=False) -> tuple:
+    """Get the features of a package archive, see extract_feature_from_archive().
+
+    Args:
+        archive_path: The path of the .tar.gz, .tgz or .zip archive.
+        file_workers: The number of worker processes to analyze the files of a large package with.
+        verdict_only: Only extract the features, without their positions.
+
+    Returns:
+        The features and the feature positions of the package.
+    """
+    package_feature = PackageFeature()
+    position_recorder = NullPositionRecorder() if verdict_only else PositionRecorder()
+    # the files are analyzed while streaming, unless they may be analyzed in parallel
+    buffered_files = []
+    setup_name = None
+    setup_data = None
+    for member_name, data in iter_archive_members(archive_path):
+        file_name = os.path.basename(member_name)
+        # 1. extract package metadata
+        if member_name == 'PKG-INFO':
+            try:
+                package_metadata = Distribution()
+                package_metadata.parse(data.decode('utf-8', errors='ignore'))
+                extract_metadata_feature(package_metadata, package_feature)
+            except Exception:
+                pass
+            continue
+        if not member_name.endswith('.py'):
+            continue
+        # 2. extract features from each file
+        if file_workers > 1:
+            buffered_files.append((member_name, data))
+        else:
+            extract_feature_from_file(member_name, data, package_feature, position_recorder)
+        # keep the outermost setup.py for the statistical features
+        if file_name == 'setup.py' and (setup_name is None or member_name.count('/') < setup_name.count('/')):
+            setup_name = member_name
+            setup_data = data
+    extract_feature_from_files(buffered_files, package_feature, position_recorder, file_workers)
+    # 3. extract statistical features
+    if setup_name:
+        package_feature.entropy = calculate_entropy(decode_source_or_utf8(setup_data))
+        package_feature.compression_ratio = calculate_compression_ratio(setup_data)
+    return package_feature, position_recorder
+
+def extract_feature_from_file(file_path: str, data: bytes, package_feature: PackageFeature, position_recorder: PositionRecorder):
+    """Extract features from a python file. Files which cannot be read or parsed are ignored.
+
+    When the positions are not recorded, the file is only analyzed until the features of the package are final.
+    The features of a file are looked up in the feature cache, see FeatureCache, before it is analyzed.
+    The file is read once, and its raw content is shared by the feature cache and the analyzers.
+
+    Args:
+        file_path: The path of the python file.
+        data: The raw content of the python file, see open_source(), None to read it from file_path.
+        package_feature: The package feature to merge the features of the file into.
+        position_recorder: The position recorder.
+    """
+    is_in_setup_py = os.path.basename(file_path) == 'setup.py'
+    pending_feature_names = None
+    if not position_recorder.enabled:
+        pending_feature_names = get_pending_feature_names(package_feature, is_in_setup_py)
+        if not pending_feature_names:
+            return
+    feature_cache = get_feature_cache()
+    try:
+        with open_source(file_path) if data is None else nullcontext(data) as data:
+            if feature_cache is None:
+                package_feature.merge(get_file_feature(file_path, data, is_in_setup_py, position_recorder, pending_feature_names))
+                return
+            key = feature_cache.get_key(data, is_in_setup_py)
+            cached_feature = feature_cache.get(key, file_path)
+            if cached_feature is None:
+                file_position_recorder = PositionRecorder() if position_recorder.enabled else NullPositionRecorder()
+                try:
+                    file_feature = get_file_feature(file_path, data, is_in_setup_py, file_position_recorder, pending_feature_names)
+                except UNANALYZABLE_FILE_ERRORS:
+                    # a file which cannot be decoded or parsed is cached as a file without features
+                    file_feature = PackageFeature()
+                    file_position_recorder = PositionRecorder()
+                # the features of a partially analyzed file are not cached
+                if pending_feature_names is None:
+                    feature_cache.put(key, file_feature, file_position_recorder)
+            else:
+                file_feature, file_position_recorder = cached_feature
+            package_feature.merge(file_feature)
+            position_recorder.merge(file_position_recorder)
+    except Exception:
+        pass
+
+def get_file_feature(file_path: str, data: bytes, is_in_setup_py: bool, position_recorder: PositionRecorder, pending_feature_names: list) -> PackageFeature:
+    """Analyze a python file. A file which cannot be parsed, like python 2 code, is analyzed from its tokens.
+
+    When only the pending features are looked for, a file whose raw content shows that it can not set any of
+    them is not parsed, see get_prefiltered_feature().
+
+    Args:
+        file_path: The path of the python file.
+        data: The raw content of the python file, see open_source().
+        is_in_setup_py: Whether the file is setup.py.
+        position_recorder: The position recorder.
+        pending_feature_names: The features which are not set yet, see get_feature_by_ast().
+
+    Returns:
+        The features of the file.
+    """
+    if pending_feature_names is not None:
+        prefiltered_feature = get_prefiltered_feature(data, is_in_setup_py, pending_feature_names)
+        if prefiltered_feature is not None:
+            return prefiltered_feature
+    content = decode_source_or_utf8(data)
+    try:
+        return get_feature_by_content(content, is_in_setup_py, position_recorder, file_path, pending_feature_names)
+    except (SyntaxError, ValueError, RecursionError):
+        return get_feature_by_tokens(content, is_in_setup_py, position_recorder, file_path, pending_feature_names)
+
+def get_feature_by_files(files: list, verdict_only: bool=False) -> tuple:
+    """Get the features of python files.
+
+    Args:
+        files: The pairs of the path and the raw content of the python files, see extract_feature_from_file().
+        verdict_only: Only extract the features, without their positions.
+
+    Returns:
+        The merged features and the feature positions of the files.
+    """
+    package_feature = PackageFeature()
+    position_recorder = NullPositionRecorder() if verdict_only else PositionRecorder()
+    for file_path, data in files:
+        extract_feature_from_file(file_path, data, package_feature, position_recorder)
+    return package_feature, position_recorder
+
+def extract_feature_from_files(files: list, package_feature: PackageFeature, position_recorder: PositionRecorder, file_workers: int=1):
+    """Extract features from python files.
+
+    The files of a large package are split into chunks which are analyzed by worker processes. The
+    partial results are merged in file order, so the result is the same as analyzing the files one by one.
+
+    Args:
+        files: The pairs of the path and the raw content of the python files, see extract_feature_from_file().
+        package_feature: The package feature to merge the features of the files into.
+        position_recorder: The position recorder.
+        file_workers: The number of worker processes.
+    """
+    if file_workers <= 1 or len(files) < SETTINGS['extract']['large_package_file_number']:
+        for file_path, data in files:
+            extract_feature_from_file(file_path, data, package_feature, position_recorder)
+        return
+    # a memory-mapped file can not be sent to a worker process, which reads the file again
+    files = [(file_path, data if data is None or type(data) is bytes else None) for file_path, data in files]
+    # several chunks per worker balance files of different sizes
+    chunk_size = -(-len(files) // (file_workers * 4))
+    chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+    with ProcessPoolExecutor(max_workers=file_workers) as executor:
+        get_feature = partial(get_feature_by_files, verdict_only=not position_recorder.enabled)
+        for package_feature_temp, position_recorder_temp in executor.map(get_feature, chunks):
+            package_feature.merge(package_feature_temp)
+            position_recorder.merge(position_recorder_temp)
+
+def extract_metadata_feature(package_metadata: Distribution, package_feature: PackageFeature):
+    """Extract the features of the package metadata.
+
+    Args:
+        package_metadata: The parsed package metadata.
+        package_feature: The package feature to update.
+    """
+    if package_metadata.author is not None:
+        package_feature.set_feature('exist_author')
+    if package_metadata.home_page is not None:
+        package_feature.set_feature('exist_home_page')
+        if package_metadata.name in package_metadata.home_page:
+            package_feature.set_feature('is_package_name_in_home_page')
+    if package_metadata.license is not None and package_metadata.license.lower() != 'unlicense':
+        package_feature.set_feature('exist_license')
+
+def save_feature(package_feature: PackageFeature, position_recorder: PositionRecorder, feature_file_name: str, feature_file_dir: str, feature_position_file_dir: str)->str:
+    """Save the features and the feature positions of a package.
+
+    Args:
+        package_feature: The features of the package.
+        position_recorder: The feature positions of the package.
+        feature_file_name: The name of the feature file and the feature position file.
+        feature_file_dir: The directory to save the feature file.
+        feature_position_file_dir: The directory to save the feature position file.
+
+    Returns:
+        The path of the feature position file, None if the positions are not recorded.
+    """
     dest_path = os.path.join(feature_file_dir, feature_file_name + '.csv')
     with open(dest_path, 'w') as f:
-        writer = csv.writer(f)
-        # setup.py
-        writer.writerow(['include_ip_in_install_script', package_feature.include_ip_in_install_script])
-        writer.writerow(['use_base64_conversion_in_install_script', package_feature.use_base64_conversion_in_install_script])
-        writer.writerow(['include_base64_string_in_install_script', package_feature.include_base64_string_in_install_script])
-        writer.writerow(['decode_base64_string_in_install_script', package_feature.decode_base64_string_in_install_script])
-        writer.writerow(['include_domain_in_install_script', package_feature.include_domain_in_install_script])
-        writer.writerow(['include_byte_string_in_install_script', package_feature.include_byte_string_in_install_script])
-        writer.writerow(['use_process_in_install_script', package_feature.use_process_in_install_script])
-        writer.writerow(['use_fs_in_install_script', package_feature.use_fs_in_install_script])
-        writer.writerow(['use_network_in_install_script', package_feature.use_network_in_install_script])
-        writer.writerow(['use_env_in_install_script', package_feature.use_env_in_install_script])
-        writer.writerow(['include_suspicious_string_in_install_script', package_feature.include_suspicious_string_in_install_script])
-        writer.writerow(['use_crypto_and_zip_in_install_script', package_feature.use_crypto_and_zip_in_install_script])
-        writer.writerow(['use_eval_in_install_script', package_feature.use_eval_in_install_script])
-        writer.writerow(['use_exec_in_install_script', package_feature.use_exec_in_install_script])
-        writer.writerow(['use_obfuscation_in_install_script', package_feature.use_obfuscation_in_install_script])
-        # python file (except setup.py)
-        writer.writerow(['include_ip_in_py_file', package_feature.include_ip_in_py_file])
-        writer.writerow(['use_base64_conversion_in_py_file', package_feature.use_base64_conversion_in_py_file])
-        writer.writerow(['include_base64_string_in_py_file', package_feature.include_base64_string_in_py_file])
-        writer.writerow(['decode_base64_string_in_py_file', package_feature.decode_base64_string_in_py_file])
-        writer.writerow(['include_domain_in_py_file', package_feature.include_domain_in_py_file])
-        writer.writerow(['include_byte_string_in_py_file', package_feature.include_byte_string_in_py_file])
-        writer.writerow(['use_process_in_py_file', package_feature.use_process_in_py_file])
-        writer.writerow(['use_fs_in_py_file', package_feature.use_fs_in_py_file])
-        writer.writerow(['use_network_in_py_file', package_feature.use_network_in_py_file])
-        writer.writerow(['use_env_in_py_file', package_feature.use_env_in_py_file])
-        writer.writerow(['use_crypto_and_zip_in_py_file', package_feature.use_crypto_and_zip_in_py_file])
-        writer.writerow(['use_eval_in_py_file', package_feature.use_eval_in_py_file])
-        writer.writerow(['use_exec_in_py_file', package_feature.use_exec_in_py_file])
-        writer.writerow(['use_obfuscation_in_py_file', package_feature.use_obfuscation_in_py_file])
-        # package metadata
-        writer.writerow(['exist_author', package_feature.exist_author])
-        writer.writerow(['exist_home_page', package_feature.exist_home_page])
-        writer.writerow(['exist_license', package_feature.exist_license])
-        writer.writerow(['is_package_name_in_home_page', package_feature.is_package_name_in_home_page])
-        # statistical features
-        writer.writerow(['entropy', package_feature.entropy])
-        writer.writerow(['compression_ratio', package_feature.compression_ratio])
-        writer.writerow(['include_suspicious_string_in_py_file', package_feature.include_suspicious_string_in_py_file])
-    # 6. save the feature positions
-    dest_path = os.path.join(feature_position_file_dir, feature_file_name + '.json')
-    with open(dest_path, 'w') as f:
-        f.write(position_recorder.serialize())
+        csv.writer(f).writerows(package_feature.get_rows())
+    # save the feature positions
+    if not position_recorder.enabled:
+        return None
+    extension = '.json.gz' if SETTINGS['extract']['compress_positions'] else '.json'
+    dest_path = os.path.join(feature_position_file_dir, feature_file_name + extension)
+    position_recorder.save(dest_path)
     return dest_path
\ No newline at end of file
@@ -0,0 +1,106 @@
+import os
+import json
+import sqlite3
+import hashlib
+
+from conf import SETTINGS
+
+from .package_feature import PackageFeature
+from .position_recorder import PositionRecorder
+from .version import get_extractor_version
+
+
+class FeatureCache:
+    """An on-disk cache of the features and the feature positions of python files.
+
+    A file is keyed by the SHA-256 digest of its content, whether it is setup.py and the version of the
+    extractor, so the same file is only analyzed once across packages and package versions. The positions
+    are stored without the file path, which is filled in when they are loaded. The cache is a SQLite database
+    in WAL mode, which is shared by the worker processes.
+    """
+    def __init__(self, path: str):
+        """
+        Args:
+            path: The path of the database file.
+        """
+        self.path = path
+        self.pid = os.getpid()
+        self.version = get_extractor_version()
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS file_features (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.connection.commit()
+
+    def get_key(self, data: bytes, is_in_setup_py: bool) -> str:
+        """Get the key of a python file.
+
+        Args:
+            data: The raw content of the file.
+            is_in_setup_py: Whether the file is setup.py.
+
+        Returns:
+            The key.
+        """
+        return f'{hashlib.sha256(data).hexdigest()}-{int(is_in_setup_py)}-{self.version}'
+
+    def get(self, key: str, file_path: str) -> tuple:
+        """Get the cached features of a python file.
+
+        Args:
+            key: The key of the file.
+            file_path: The path of the file, used for the feature positions.
+
+        Returns:
+            The features and the feature positions of the file, or None if the file is not cached.
+        """
+        row = self.connection.execute('SELECT value FROM file_features WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value = json.loads(row[0])
+        package_feature = PackageFeature()
+        for feature_name in value['features']:
+            package_feature.set_feature(feature_name)
+        package_feature.longest_string_length = value['longest_string_length']
+        position_recorder = PositionRecorder()
+        for feature_name, positions in value['positions'].items():
+            for position in positions:
+                position_recorder.add_record(feature_name, file_path, *position)
+        return package_feature, position_recorder
+
+    def put(self, key: str, package_feature: PackageFeature, position_recorder: PositionRecorder):
+        """Cache the features of a python file.
+
+        Args:
+            key: The key of the file.
+            package_feature: The features of the file.
+            position_recorder: The feature positions of the file.
+        """
+        value = {
+            'features': package_feature.get_feature_names(),
+            'longest_string_length': package_feature.longest_string_length,
+            'positions': {
+                feature_name: [list(record[1:]) for record in position_recorder.get_records(feature_name)]
+                for feature_name in position_recorder.positions
+            }
+        }
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO file_features (key, value) VALUES (?, ?)', (key, json.dumps(value)))
+
+# the feature cache of the current process
+feature_cache = None
+
+def get_feature_cache() -> FeatureCache:
+    """Get the feature cache of the current process, opened on first use.
+
+    Returns:
+        The feature cache, or None if the feature cache is disabled in the settings.
+    """
+    global feature_cache
+    path = SETTINGS['extract']['feature_cache']
+    if not path:
+        return None
+    # a connection can not be shared with a forked worker process
+    if feature_cache is None or feature_cache.pid != os.getpid():
+        feature_cache = FeatureCache(path)
+    return feature_cache
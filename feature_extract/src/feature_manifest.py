@@ -0,0 +1,151 @@
+import os
+
+from .archive_util import get_package_name, get_archive_limits, hash_file, load_manifest, save_manifest
+from .version import get_extractor_version
+from .feature_store import FeatureStore
+
+
+class FeatureManifest:
+    """The manifest of the features extracted from a dataset.
+
+    The manifest records the size, mtime and digest of every extracted archive, the extractor version and
+    the feature files written for it, so a re-extraction only extracts the new and the changed archives and
+    removes the features of the deleted ones. The feature vectors are kept in the FeatureStore of the
+    dataset as well. The manifest and the store are written by save().
+    """
+    def __init__(self, manifest_path: str, feature_dir: str, feature_position_dir: str, verdict_only: bool = False):
+        """
+        Args:
+            manifest_path: The path of the manifest file.
+            feature_dir: The folder of the feature files of the dataset.
+            feature_position_dir: The folder of the feature position files of the dataset.
+            verdict_only: Whether the features are extracted without their positions.
+        """
+        self.manifest_path = manifest_path
+        self.feature_dir = feature_dir
+        self.feature_position_dir = feature_position_dir
+        self.verdict_only = verdict_only
+        self.version = get_extractor_version()
+        self.entries = load_manifest(manifest_path)
+        self.feature_store = FeatureStore(feature_dir)
+        # the stat and the digest of the archives checked by is_extracted()
+        self.archives = {}
+
+    def is_extracted(self, dataset_path: str, file_name: str) -> bool:
+        """Check whether the features of an archive are up to date.
+
+        An archive is only hashed when its size or mtime changed.
+
+        Args:
+            dataset_path: Path of dataset.
+            file_name: The file name of the archive.
+
+        Returns:
+            True if the archive is unchanged and its features, or its skip under the current archive limits,
+            are up to date.
+        """
+        stat = os.stat(os.path.join(dataset_path, file_name))
+        archive = {'size': stat.st_size, 'mtime': stat.st_mtime_ns}
+        entry = self.entries.get(file_name)
+        if entry is not None and (entry['size'], entry['mtime']) == (archive['size'], archive['mtime']):
+            archive['sha256'] = entry['sha256']
+        else:
+            archive['sha256'] = hash_file(os.path.join(dataset_path, file_name))
+        self.archives[file_name] = archive
+        if entry is None or entry['sha256'] != archive['sha256'] or entry['version'] != self.version:
+            return False
+        entry.update(archive)
+        if 'skipped' in entry:
+            # a skipped archive is retried once the archive limits change
+            return entry.get('limits') == get_archive_limits()
+        if not os.path.exists(os.path.join(self.feature_dir, entry['feature_file'])) or not self.feature_store.has(get_package_name(file_name)):
+            return False
+        # the features extracted without their positions do not satisfy a full extraction
+        return self.verdict_only or (entry['position_file'] is not None and os.path.exists(os.path.join(self.feature_position_dir, entry['position_file'])))
+
+    def add(self, file_name: str, position_file_path: str, feature_vector):
+        """Record the features extracted from an archive checked by is_extracted().
+
+        Args:
+            file_name: The file name of the archive.
+            position_file_path: The path of the feature position file, None if the positions are not extracted.
+            feature_vector: The feature vector of the package, see PackageFeature.to_vector().
+        """
+        package_name = get_package_name(file_name)
+        self.feature_store.put(package_name, feature_vector)
+        # the positions extracted from a previous version of the archive, or in another format, are stale
+        for stale_position_file_name in (f'{package_name}.json', f'{package_name}.json.gz'):
+            stale_position_file_path = os.path.join(self.feature_position_dir, stale_position_file_name)
+            if (position_file_path is None or os.path.basename(position_file_path) != stale_position_file_name) and os.path.exists(stale_position_file_path):
+                os.remove(stale_position_file_path)
+        self.entries[file_name] = {
+            **self.archives[file_name],
+            'version': self.version,
+            'feature_file': f'{package_name}.csv',
+            'position_file': None if position_file_path is None else os.path.basename(position_file_path)
+        }
+
+    def skip(self, file_name: str, reason: str):
+        """Record that an archive checked by is_extracted() exceeds the archive limits.
+
+        Args:
+            file_name: The file name of the archive.
+            reason: The exceeded limit.
+        """
+        self.remove(file_name)
+        self.entries[file_name] = {**self.archives[file_name], 'version': self.version, 'skipped': reason, 'limits': get_archive_limits()}
+
+    def remove(self, file_name: str):
+        """Remove an archive and its feature files.
+
+        Args:
+            file_name: The file name of the archive.
+        """
+        entry = self.entries.pop(file_name, None)
+        package_name = get_package_name(file_name)
+        self.feature_store.remove(package_name)
+        paths = [
+            os.path.join(self.feature_dir, f'{package_name}.csv'),
+            os.path.join(self.feature_position_dir, f'{package_name}.json'),
+            os.path.join(self.feature_position_dir, f'{package_name}.json.gz')
+        ]
+        if entry is not None and 'skipped' not in entry:
+            paths.append(os.path.join(self.feature_dir, entry['feature_file']))
+            if entry['position_file'] is not None:
+                paths.append(os.path.join(self.feature_position_dir, entry['position_file']))
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def prune(self, file_names: list) -> list:
+        """Remove the archives which are no longer in the dataset.
+
+        Args:
+            file_names: The file names of the archives in the dataset.
+
+        Returns:
+            The file names of the removed archives.
+        """
+        file_names = set(file_names)
+        removed_file_names = [file_name for file_name in self.entries if file_name not in file_names]
+        for file_name in removed_file_names:
+            self.remove(file_name)
+        return removed_file_names
+
+    def get_skipped_packages(self) -> dict:
+        """Get the archives which exceed the archive limits.
+
+        Returns:
+            The exceeded limit of every skipped archive.
+        """
+        return {file_name: entry['skipped'] for file_name, entry in self.entries.items() if 'skipped' in entry}
+
+    def clear(self):
+        """Forget all archives, to extract the dataset from scratch."""
+        self.entries = {}
+        self.feature_store.clear()
+
+    def save(self):
+        """Save the manifest and the feature store."""
+        self.feature_store.save()
+        save_manifest(self.entries, self.manifest_path)
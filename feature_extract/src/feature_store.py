@@ -0,0 +1,118 @@
+import os
+
+import numpy
+
+from .archive_util import load_manifest, save_manifest
+from .package_feature import FEATURE_FILE_NAMES
+
+# the type of the values of the feature matrix
+FEATURE_DTYPE = numpy.dtype('<f8')
+# the size of a row of the feature matrix in bytes
+ROW_SIZE = len(FEATURE_FILE_NAMES) * FEATURE_DTYPE.itemsize
+
+class FeatureStore:
+    """The feature vectors of a dataset, as one matrix.
+
+    The store is made of three files next to the feature folder of the dataset:
+    - <dataset>.matrix: the feature vectors, one row of FEATURE_FILE_NAMES per package, as raw little-endian
+      float64 values which can be memory-mapped.
+    - <dataset>.packages.json: the package name of every row.
+    - <dataset>.schema.json: the columns and the value type of the matrix.
+
+    The changes are written by save(): the new packages are appended, the re-extracted packages are
+    overwritten in place, and the matrix is only rewritten when packages are removed.
+    """
+    def __init__(self, store_path: str):
+        """
+        Args:
+            store_path: The path of the store without extension, the feature folder of the dataset.
+        """
+        self.matrix_path = f'{store_path}.matrix'
+        self.packages_path = f'{store_path}.packages.json'
+        self.schema_path = f'{store_path}.schema.json'
+        self.schema = {'columns': list(FEATURE_FILE_NAMES), 'dtype': FEATURE_DTYPE.str}
+        # the package name of every row, None for the removed rows
+        self.package_names = []
+        # a store written with other columns, or cut short, is discarded
+        if load_manifest(self.schema_path) == self.schema and os.path.exists(self.matrix_path):
+            package_names = load_manifest(self.packages_path) or []
+            if os.path.getsize(self.matrix_path) >= len(package_names) * ROW_SIZE:
+                self.package_names = package_names
+        # package name -> row
+        self.rows = {package_name: row for row, package_name in enumerate(self.package_names)}
+        # the number of rows of the matrix file which belong to the store
+        self.saved_row_number = len(self.package_names)
+        # the rows set since the last save: row -> feature vector
+        self.changed_rows = {}
+        self.compact = not os.path.exists(self.matrix_path)
+
+    def has(self, package_name: str) -> bool:
+        """Check whether the store has the features of a package.
+
+        Args:
+            package_name: The name of the package.
+
+        Returns:
+            True if the package has a row.
+        """
+        return package_name in self.rows
+
+    def put(self, package_name: str, feature_vector):
+        """Set the features of a package, see PackageFeature.to_vector().
+
+        Args:
+            package_name: The name of the package.
+            feature_vector: The feature vector of the package.
+        """
+        row = self.rows.get(package_name)
+        if row is None:
+            row = self.rows[package_name] = len(self.package_names)
+            self.package_names.append(package_name)
+        self.changed_rows[row] = numpy.asarray(feature_vector, dtype=FEATURE_DTYPE)
+
+    def remove(self, package_name: str):
+        """Remove the features of a package.
+
+        Args:
+            package_name: The name of the package.
+        """
+        row = self.rows.pop(package_name, None)
+        if row is not None:
+            self.package_names[row] = None
+            self.changed_rows.pop(row, None)
+            self.compact = True
+
+    def clear(self):
+        """Remove the features of all packages."""
+        self.package_names = []
+        self.rows = {}
+        self.saved_row_number = 0
+        self.changed_rows = {}
+        self.compact = True
+
+    def save(self):
+        """Save the changes of the store."""
+        if self.compact:
+            matrix = numpy.zeros((len(self.package_names), len(FEATURE_FILE_NAMES)), dtype=FEATURE_DTYPE)
+            if self.saved_row_number:
+                matrix[:self.saved_row_number] = numpy.fromfile(self.matrix_path, dtype=FEATURE_DTYPE, count=self.saved_row_number * len(FEATURE_FILE_NAMES)).reshape(self.saved_row_number, -1)
+            for row, feature_vector in self.changed_rows.items():
+                matrix[row] = feature_vector
+            kept_rows = [row for row, package_name in enumerate(self.package_names) if package_name is not None]
+            temp_path = f'{self.matrix_path}.{os.getpid()}.tmp'
+            matrix[kept_rows].tofile(temp_path)
+            os.replace(temp_path, self.matrix_path)
+            self.package_names = [self.package_names[row] for row in kept_rows]
+            self.rows = {package_name: row for row, package_name in enumerate(self.package_names)}
+        elif self.changed_rows:
+            with open(self.matrix_path, 'r+b') as f:
+                # the rows written after the last saved package names are overwritten
+                f.truncate(self.saved_row_number * ROW_SIZE)
+                for row in sorted(self.changed_rows):
+                    f.seek(row * ROW_SIZE)
+                    f.write(self.changed_rows[row].tobytes())
+        save_manifest(self.schema, self.schema_path)
+        save_manifest(self.package_names, self.packages_path)
+        self.saved_row_number = len(self.package_names)
+        self.changed_rows = {}
+        self.compact = False
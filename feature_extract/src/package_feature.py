@@ -1,49 +1,143 @@
+import numpy
+
+# the boolean features, in the order of their bits
+BOOLEAN_FEATURE_NAMES = (
+    # setup.py
+    'include_ip_in_install_script',
+    'use_base64_conversion_in_install_script',
+    'include_base64_string_in_install_script',
+    'decode_base64_string_in_install_script',
+    'include_domain_in_install_script',
+    'include_byte_string_in_install_script',
+    'use_operating_system_in_install_script',
+    'use_process_in_install_script',
+    'use_fs_in_install_script',
+    'use_network_in_install_script',
+    'use_env_in_install_script',
+    'include_suspicious_string_in_install_script',
+    'use_crypto_and_zip_in_install_script',
+    'use_eval_in_install_script',
+    'use_exec_in_install_script',
+    'use_obfuscation_in_install_script',
+    # python file (except setup.py)
+    'include_ip_in_py_file',
+    'use_base64_conversion_in_py_file',
+    'include_base64_string_in_py_file',
+    'decode_base64_string_in_py_file',
+    'include_domain_in_py_file',
+    'include_byte_string_in_py_file',
+    'use_operating_system_in_py_file',
+    'use_process_in_py_file',
+    'use_fs_in_py_file',
+    'use_network_in_py_file',
+    'use_env_in_py_file',
+    'include_suspicious_string_in_py_file',
+    'use_crypto_and_zip_in_py_file',
+    'use_eval_in_py_file',
+    'use_exec_in_py_file',
+    'use_obfuscation_in_py_file',
+    # package metadata
+    'exist_author',
+    'exist_home_page',
+    'exist_license',
+    'is_package_name_in_home_page',
+)
+# the numeric features, merged by their maximum
+NUMERIC_FEATURE_NAMES = ('longest_string_length', 'entropy', 'compression_ratio')
+FEATURE_BITS = {feature_name: 1 << i for i, feature_name in enumerate(BOOLEAN_FEATURE_NAMES)}
+# the use_operating_system features are kept per file, they are not in the feature files
+MERGED_FEATURE_MASK = sum(FEATURE_BITS.values()) & ~FEATURE_BITS['use_operating_system_in_install_script'] & ~FEATURE_BITS['use_operating_system_in_py_file']
+MERGED_FEATURE_NAMES = frozenset(feature_name for feature_name in BOOLEAN_FEATURE_NAMES if FEATURE_BITS[feature_name] & MERGED_FEATURE_MASK)
+
+# the features of the feature files and of the feature vectors, in their order
+FEATURE_FILE_NAMES = (
+    # setup.py
+    'include_ip_in_install_script',
+    'use_base64_conversion_in_install_script',
+    'include_base64_string_in_install_script',
+    'decode_base64_string_in_install_script',
+    'include_domain_in_install_script',
+    'include_byte_string_in_install_script',
+    'use_process_in_install_script',
+    'use_fs_in_install_script',
+    'use_network_in_install_script',
+    'use_env_in_install_script',
+    'include_suspicious_string_in_install_script',
+    'use_crypto_and_zip_in_install_script',
+    'use_eval_in_install_script',
+    'use_exec_in_install_script',
+    'use_obfuscation_in_install_script',
+    # python file (except setup.py)
+    'include_ip_in_py_file',
+    'use_base64_conversion_in_py_file',
+    'include_base64_string_in_py_file',
+    'decode_base64_string_in_py_file',
+    'include_domain_in_py_file',
+    'include_byte_string_in_py_file',
+    'use_process_in_py_file',
+    'use_fs_in_py_file',
+    'use_network_in_py_file',
+    'use_env_in_py_file',
+    'use_crypto_and_zip_in_py_file',
+    'use_eval_in_py_file',
+    'use_exec_in_py_file',
+    'use_obfuscation_in_py_file',
+    # package metadata
+    'exist_author',
+    'exist_home_page',
+    'exist_license',
+    'is_package_name_in_home_page',
+    # statistical features
+    'entropy',
+    'compression_ratio',
+    'include_suspicious_string_in_py_file',
+)
+# the bit of every boolean column of the feature files, 0 for the numeric columns
+FEATURE_FILE_BITS = tuple(FEATURE_BITS.get(feature_name, 0) for feature_name in FEATURE_FILE_NAMES)
+
 class PackageFeature:
+    """The features of a package or of a python file.
+
+    The boolean features are the bits of an integer, see BOOLEAN_FEATURE_NAMES, so merging the features of
+    two files is a bitwise or plus the maximum of the numeric features.
+    """
+    __slots__ = ('flags',) + NUMERIC_FEATURE_NAMES
+
     def __init__(self):
-        # setup.py
-        self.include_ip_in_install_script = 'false'
-        self.use_base64_conversion_in_install_script = 'false'
-        self.include_base64_string_in_install_script = 'false'
-        self.decode_base64_string_in_install_script = 'false'
-        self.include_domain_in_install_script = 'false'
-        self.include_byte_string_in_install_script = 'false'
-        self.use_operating_system_in_install_script = 'false'
-        self.use_process_in_install_script = 'false'
-        self.use_fs_in_install_script = 'false'
-        self.use_network_in_install_script = 'false'
-        self.use_env_in_install_script = 'false'
-        self.include_suspicious_string_in_install_script = 'false'
-        self.use_crypto_and_zip_in_install_script = 'false'
-        self.use_eval_in_install_script = 'false'
-        self.use_exec_in_install_script = 'false'
-        self.use_obfuscation_in_install_script = 'false'
-        # python file (except setup.py)
-        self.include_ip_in_py_file = 'false'
-        self.use_base64_conversion_in_py_file = 'false'
-        self.include_base64_string_in_py_file = 'false'
-        self.decode_base64_string_in_py_file = 'false'
-        self.include_domain_in_py_file = 'false'
-        self.include_byte_string_in_py_file = 'false'
-        self.use_operating_system_in_py_file = 'false'
-        self.use_process_in_py_file = 'false'
-        self.use_fs_in_py_file = 'false'
-        self.use_network_in_py_file = 'false'
-        self.use_env_in_py_file = 'false'
-        self.include_suspicious_string_in_py_file = 'false'
-        self.use_crypto_and_zip_in_py_file = 'false'
-        self.use_eval_in_py_file = 'false'
-        self.use_exec_in_py_file = 'false'
-        self.use_obfuscation_in_py_file = 'false'
-        # package metadata
-        self.exist_author = 'false'
-        self.exist_home_page = 'false'
-        self.exist_license = 'false'
-        self.is_package_name_in_home_page = 'false'
+        # the bits of the boolean features which are set
+        self.flags = 0
         # statistical features
         self.longest_string_length = 0
         self.entropy = 0
         self.compression_ratio = 0
-    
+
+    def set_feature(self, feature_name: str):
+        """Set a boolean feature.
+
+        Args:
+            feature_name: The name of the feature.
+        """
+        self.flags |= FEATURE_BITS[feature_name]
+
+    def has_feature(self, feature_name: str) -> bool:
+        """Check whether a boolean feature is set.
+
+        Args:
+            feature_name: The name of the feature.
+
+        Returns:
+            True if the feature is set.
+        """
+        return self.flags & FEATURE_BITS[feature_name] != 0
+
+    def get_feature_names(self) -> list:
+        """Get the boolean features which are set.
+
+        Returns:
+            The names of the features, in the order of BOOLEAN_FEATURE_NAMES.
+        """
+        return [feature_name for feature_name in BOOLEAN_FEATURE_NAMES if self.flags & FEATURE_BITS[feature_name]]
+
     def merge(self, other: 'PackageFeature') -> 'PackageFeature':
         """Merge two PackageFeature objects.
 
@@ -53,81 +147,37 @@ class PackageFeature:
         Returns:
             The merged PackageFeature object.
         """
-        # setup.py
-        if self.include_ip_in_install_script == 'false':
-            self.include_ip_in_install_script = other.include_ip_in_install_script
-        if self.use_base64_conversion_in_install_script == 'false':
-            self.use_base64_conversion_in_install_script = other.use_base64_conversion_in_install_script
-        if self.include_base64_string_in_install_script == 'false':
-            self.include_base64_string_in_install_script = other.include_base64_string_in_install_script
-        if self.decode_base64_string_in_install_script == 'false':
-            self.decode_base64_string_in_install_script = other.decode_base64_string_in_install_script
-        if self.include_domain_in_install_script == 'false':
-            self.include_domain_in_install_script = other.include_domain_in_install_script
-        if self.include_byte_string_in_install_script == 'false':
-            self.include_byte_string_in_install_script = other.include_byte_string_in_install_script
-        if self.use_process_in_install_script == 'false':
-            self.use_process_in_install_script = other.use_process_in_install_script
-        if self.use_fs_in_install_script == 'false':
-            self.use_fs_in_install_script = other.use_fs_in_install_script
-        if self.use_network_in_install_script == 'false':
-            self.use_network_in_install_script = other.use_network_in_install_script
-        if self.use_env_in_install_script == 'false':
-            self.use_env_in_install_script = other.use_env_in_install_script
-        if self.include_suspicious_string_in_install_script == 'false':
-            self.include_suspicious_string_in_install_script = other.include_suspicious_string_in_install_script
-        if self.use_crypto_and_zip_in_install_script == 'false':
-            self.use_crypto_and_zip_in_install_script = other.use_crypto_and_zip_in_install_script
-        if self.use_eval_in_install_script == 'false':
-            self.use_eval_in_install_script = other.use_eval_in_install_script
-        if self.use_exec_in_install_script == 'false':
-            self.use_exec_in_install_script = other.use_exec_in_install_script
-        if self.use_obfuscation_in_install_script == 'false':
-            self.use_obfuscation_in_install_script = other.use_obfuscation_in_install_script
-        # python file (except setup.py)
-        if self.include_ip_in_py_file == 'false':
-            self.include_ip_in_py_file = other.include_ip_in_py_file
-        if self.use_base64_conversion_in_py_file == 'false':
-            self.use_base64_conversion_in_py_file = other.use_base64_conversion_in_py_file
-        if self.include_base64_string_in_py_file == 'false':
-            self.include_base64_string_in_py_file = other.include_base64_string_in_py_file
-        if self.decode_base64_string_in_py_file == 'false':
-            self.decode_base64_string_in_py_file = other.decode_base64_string_in_py_file
-        if self.include_domain_in_py_file == 'false':
-            self.include_domain_in_py_file = other.include_domain_in_py_file
-        if self.include_byte_string_in_py_file == 'false':
-            self.include_byte_string_in_py_file = other.include_byte_string_in_py_file
-        if self.use_process_in_py_file == 'false':
-            self.use_process_in_py_file = other.use_process_in_py_file
-        if self.use_fs_in_py_file == 'false':
-            self.use_fs_in_py_file = other.use_fs_in_py_file
-        if self.use_network_in_py_file == 'false':
-            self.use_network_in_py_file = other.use_network_in_py_file
-        if self.use_env_in_py_file == 'false':
-            self.use_env_in_py_file = other.use_env_in_py_file
-        if self.include_suspicious_string_in_py_file == 'false':
-            self.include_suspicious_string_in_py_file = other.include_suspicious_string_in_py_file
-        if self.use_crypto_and_zip_in_py_file == 'false':
-            self.use_crypto_and_zip_in_py_file = other.use_crypto_and_zip_in_py_file
-        if self.use_eval_in_py_file == 'false':
-            self.use_eval_in_py_file = other.use_eval_in_py_file
-        if self.use_exec_in_py_file == 'false':
-            self.use_exec_in_py_file = other.use_exec_in_py_file
-        if self.use_obfuscation_in_py_file == 'false':
-            self.use_obfuscation_in_py_file = other.use_obfuscation_in_py_file
-        # package metadata
-        if self.exist_author == 'false':
-            self.exist_author = other.exist_author
-        if self.exist_home_page == 'false':
-            self.exist_home_page = other.exist_home_page
-        if self.exist_license == 'false':
-            self.exist_license = other.exist_license
-        if self.is_package_name_in_home_page == 'false':
-            self.is_package_name_in_home_page = other.is_package_name_in_home_page
+        self.flags |= other.flags & MERGED_FEATURE_MASK
         # statistical features
         if self.entropy < other.entropy:
             self.entropy = other.entropy
         if self.compression_ratio < other.compression_ratio:
             self.compression_ratio = other.compression_ratio
         if self.longest_string_length < other.longest_string_length:
-            self.longest_string_length = other.longest_string_length
\ No newline at end of file
+            self.longest_string_length = other.longest_string_length
+        return self
+
+    def get_rows(self) -> list:
+        """Get the rows of the feature file.
+
+        Returns:
+            The name and the value of every feature of FEATURE_FILE_NAMES, 'true' or 'false' for the
+            boolean features.
+        """
+        flags = self.flags
+        return [
+            (feature_name, ('true' if flags & bit else 'false') if bit else getattr(self, feature_name))
+            for feature_name, bit in zip(FEATURE_FILE_NAMES, FEATURE_FILE_BITS)
+        ]
+
+    def to_vector(self) -> numpy.ndarray:
+        """Get the feature vector for the classifiers, like a feature file read by read_feature_from_file().
+
+        Returns:
+            The values of the features of FEATURE_FILE_NAMES, 1 or 0 for the boolean features.
+        """
+        flags = self.flags
+        return numpy.array([
+            (1.0 if flags & bit else 0.0) if bit else getattr(self, feature_name)
+            for feature_name, bit in zip(FEATURE_FILE_NAMES, FEATURE_FILE_BITS)
+        ], dtype=numpy.float64)
@@ -0,0 +1,59 @@
+import time
+import argparse
+
+from prettytable import PrettyTable
+
+from .string_classifier import classify_string
+
+
+def get_pathological_strings(length: int) -> dict:
+    """Get the strings which are the worst cases of the patterns.
+
+    Args:
+        length: The approximate length of the strings.
+
+    Returns:
+        The strings, by name.
+    """
+    return {
+        # nested labels, quadratic with the original DOMAIN_PATTERN
+        'dotted labels': 'a.' * (length // 2) + '1',
+        'dashed labels': 'a-' * (length // 2),
+        'long label': 'a' * length + '.1',
+        'dash dot labels': ('a' * 62 + '-.') * (length // 64),
+        'dotted digits': '1.' * (length // 2),
+        # base64 strings failing at the last character
+        'base64 near miss': 'A' * (length - length % 4 - 1) + '!',
+        'base64 padding': 'QUJD' * (length // 4 - 1) + 'QQ=\n',
+        'base64 newlines': 'QUJD\n' * (length // 5),
+        'slashes': '/etc' * (length // 4),
+    }
+
+def run_benchmark(lengths: list, repeat: int = 3) -> PrettyTable:
+    """Time classify_string() on the pathological strings of every length.
+
+    Args:
+        lengths: The lengths of the strings.
+        repeat: The number of runs per string, the fastest one is reported.
+
+    Returns:
+        The table of the seconds per string and the nanoseconds per character.
+    """
+    table = PrettyTable()
+    table.field_names = ['string', 'length', 'seconds', 'ns / char']
+    for length in lengths:
+        for name, value in get_pathological_strings(length).items():
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                classify_string(value)
+                best = min(best, time.perf_counter() - start)
+            table.add_row([name, len(value), f'{best:.6f}', f'{best * 1e9 / max(len(value), 1):.2f}'])
+    return table
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the string classifier on pathological strings.')
+    parser.add_argument('-l', '--lengths', type=int, nargs='+', default=[10_000, 100_000, 1_000_000, 10_000_000], help='lengths of the strings')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='runs per string')
+    args = parser.parse_args()
+    print(run_benchmark(args.lengths, args.repeat))
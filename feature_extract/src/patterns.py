@@ -1,4 +1,14 @@
 DOMAIN_PATTERN = r'((?!-)[a-zA-Z0-9-]{1,63}(?<!-)\.)+[a-zA-Z]{2,6}'
 IP_PATTERN = r'(\d{1,3}\.){3}\d{1,3}'
 BASE64_PATTERN = r'^(?:[A-Za-z0-9+/]{4})*(?:[A-Za-z0-9+/]{2}==|[A-Za-z0-9+/]{3}=)?$'
-SENSITIVE_STRING_PATTERN = r'(\/etc\/shadow)|(\.bashrc)|(\.zshrc)|(\/etc\/hosts)|(\/etc\/passwd)|(\/bin\/sh)'
\ No newline at end of file
+SENSITIVE_STRING_PATTERN = r'(\/etc\/shadow)|(\.bashrc)|(\.zshrc)|(\/etc\/hosts)|(\/etc\/passwd)|(\/bin\/sh)'
+
+# linear time equivalents of the patterns above, used by the string classifier
+# a match of DOMAIN_PATTERN exists exactly when a label character is followed by a '.' and two letters
+DOMAIN_SEARCH_PATTERN = r'[a-zA-Z0-9]\.[a-zA-Z]{2}'
+# IP_PATTERN starting with a single digit, which lets the regex engine skip ahead to the digits
+IP_SEARCH_PATTERN = r'\d\d{0,2}\.(?:\d{1,3}\.){2}\d{1,3}'
+# SENSITIVE_STRING_PATTERN without the groups, which lets the regex engine skip ahead to the '/' and '.'
+SENSITIVE_STRING_SEARCH_PATTERN = r'\/etc\/shadow|\.bashrc|\.zshrc|\/etc\/hosts|\/etc\/passwd|\/bin\/sh'
+# the characters of a base64 string without its padding
+BASE64_ALPHABET_PATTERN = r'[A-Za-z0-9+/]*'
@@ -1,63 +1,208 @@
+import io
+import gzip
 import json
+from array import array
 
 MAX_RECORD_NUMBER = 1000
 
-class Record:
-    def __init__(self, file_path: str, start_line: int, start_column: int, end_line: int, end_column: int):
-        self.file_path = file_path
-        self.content = {
-            'start': {
-                'line': start_line,
-                'column': start_column
-            },
-            'end': {
-                'line': end_line,
-                'column': end_column
-            }
-        }
+# the features with positions, in the order of the feature position files
+POSITION_FEATURE_NAMES = (
+    # setup.py
+    'include_ip_in_install_script',
+    'use_base64_conversion_in_install_script',
+    'include_base64_string_in_install_script',
+    'decode_base64_string_in_install_script',
+    'include_domain_in_install_script',
+    'include_byte_string_in_install_script',
+    'use_operating_system_in_install_script',
+    'use_process_in_install_script',
+    'use_fs_in_install_script',
+    'use_network_in_install_script',
+    'use_env_in_install_script',
+    'include_suspicious_string_in_install_script',
+    'use_crypto_and_zip_in_install_script',
+    'use_eval_in_install_script',
+    'use_exec_in_install_script',
+    'use_obfuscation_in_install_script',
+    # python file (except setup.py)
+    'include_ip_in_py_file',
+    'use_base64_conversion_in_py_file',
+    'include_base64_string_in_py_file',
+    'decode_base64_string_in_py_file',
+    'include_domain_in_py_file',
+    'include_byte_string_in_py_file',
+    'use_operating_system_in_py_file',
+    'use_process_in_py_file',
+    'use_fs_in_py_file',
+    'use_network_in_py_file',
+    'use_env_in_py_file',
+    'include_suspicious_string_in_py_file',
+    'use_crypto_and_zip_in_py_file',
+    'use_eval_in_py_file',
+    'use_exec_in_py_file',
+    'use_obfuscation_in_py_file',
+)
+POSITION_FEATURE_NAME_SET = frozenset(POSITION_FEATURE_NAMES)
+# the integers stored per position: the file id, the start line and column and the end line and column
+POSITION_SIZE = 5
 
 class PositionRecorder:
+    """The positions of the features found in the python files of a package.
+
+    The positions are stored as a struct of arrays: every feature has an array of integers with the file id,
+    the start line and column and the end line and column of its positions, and the file paths are interned,
+    so a position costs 20 bytes. At most MAX_RECORD_NUMBER positions are kept per feature.
+    """
+    __slots__ = ('file_paths', 'file_ids', 'positions')
+
+    # whether the positions of the features are recorded
+    enabled = True
+
     def __init__(self):
-        # setup.py
-        self.include_ip_in_install_script = []
-        self.use_base64_conversion_in_install_script = []
-        self.include_base64_string_in_install_script = []
-        self.decode_base64_string_in_install_script = []
-        self.include_domain_in_install_script = []
-        self.include_byte_string_in_install_script = []
-        self.use_operating_system_in_install_script = []
-        self.use_process_in_install_script = []
-        self.use_fs_in_install_script = []
-        self.use_network_in_install_script = []
-        self.use_env_in_install_script = []
-        self.include_suspicious_string_in_install_script = []
-        self.use_crypto_and_zip_in_install_script = []
-        self.use_eval_in_install_script = []
-        self.use_exec_in_install_script = []
-        self.use_obfuscation_in_install_script = []
-        # python file (except setup.py)
-        self.include_ip_in_py_file = []
-        self.use_base64_conversion_in_py_file = []
-        self.include_base64_string_in_py_file = []
-        self.decode_base64_string_in_py_file = []
-        self.include_domain_in_py_file = []
-        self.include_byte_string_in_py_file = []
-        self.use_operating_system_in_py_file = []
-        self.use_process_in_py_file = []
-        self.use_fs_in_py_file = []
-        self.use_network_in_py_file = []
-        self.use_env_in_py_file = []
-        self.include_suspicious_string_in_py_file = []
-        self.use_crypto_and_zip_in_py_file = []
-        self.use_eval_in_py_file = []
-        self.use_exec_in_py_file = []
-        self.use_obfuscation_in_py_file = []
-
-    def add_record(self, feauture_name: str, record: Record) -> None:
-        if hasattr(self, feauture_name):
-            if len(getattr(self, feauture_name)) >= MAX_RECORD_NUMBER:
+        # file id -> file path
+        self.file_paths = []
+        # file path -> file id
+        self.file_ids = {}
+        # feature name -> positions, created on the first position of the feature
+        self.positions = {}
+
+    def get_file_id(self, file_path: str) -> int:
+        """Intern a file path.
+
+        Args:
+            file_path: The path of the file.
+
+        Returns:
+            The id of the file path.
+        """
+        file_id = self.file_ids.get(file_path)
+        if file_id is None:
+            file_id = self.file_ids[file_path] = len(self.file_paths)
+            self.file_paths.append(file_path)
+        return file_id
+
+    def add_record(self, feature_name: str, file_path: str, start_line: int, start_column: int, end_line: int, end_column: int):
+        """Record a position of a feature. The features without positions are ignored.
+
+        Args:
+            feature_name: The name of the feature.
+            file_path: The path of the file.
+            start_line: The line the position starts at.
+            start_column: The column the position starts at.
+            end_line: The line the position ends at.
+            end_column: The column the position ends at.
+        """
+        positions = self.positions.get(feature_name)
+        if positions is None:
+            if feature_name not in POSITION_FEATURE_NAME_SET:
                 return
-            getattr(self, feauture_name).append(record)
+            positions = self.positions[feature_name] = array('i')
+        elif len(positions) >= MAX_RECORD_NUMBER * POSITION_SIZE:
+            return
+        positions.extend((self.get_file_id(file_path), start_line, start_column, end_line, end_column))
+
+    def get_records(self, feature_name: str) -> list:
+        """Get the positions of a feature.
+
+        Args:
+            feature_name: The name of the feature.
+
+        Returns:
+            The file path, the start line and column and the end line and column of every position.
+        """
+        positions = self.positions.get(feature_name, ())
+        file_paths = self.file_paths
+        return [
+            (file_paths[positions[i]], positions[i + 1], positions[i + 2], positions[i + 3], positions[i + 4])
+            for i in range(0, len(positions), POSITION_SIZE)
+        ]
+
+    def merge(self, other: 'PositionRecorder') -> 'PositionRecorder':
+        """Merge the records of another PositionRecorder after the records of this one.
+
+        Args:
+            other: The other PositionRecorder object.
+
+        Returns:
+            The merged PositionRecorder object.
+        """
+        file_ids = None
+        for feature_name, other_positions in other.positions.items():
+            positions = self.positions.get(feature_name)
+            if positions is None:
+                positions = self.positions[feature_name] = array('i')
+            number = min(len(other_positions), max(MAX_RECORD_NUMBER * POSITION_SIZE - len(positions), 0))
+            if number == 0:
+                continue
+            if file_ids is None:
+                file_ids = [self.get_file_id(file_path) for file_path in other.file_paths]
+            start = len(positions)
+            positions.extend(other_positions[:number])
+            for i in range(start, start + number, POSITION_SIZE):
+                positions[i] = file_ids[positions[i]]
+        return self
+
+    def write(self, f):
+        """Write the positions as JSON to a text file, one feature at a time.
+
+        The JSON maps every feature name to its positions, each with the file path, and the line and the
+        column of its start and its end.
+
+        Args:
+            f: The text file.
+        """
+        file_paths = [json.dumps(file_path) for file_path in self.file_paths]
+        separator = '{'
+        for feature_name in POSITION_FEATURE_NAMES:
+            positions = self.positions.get(feature_name, ())
+            f.write(f'{separator}"{feature_name}": [')
+            f.write(', '.join(
+                f'{{"file_path": {file_paths[positions[i]]}, "content": {{"start": {{"line": {positions[i + 1]}, "column": {positions[i + 2]}}}, "end": {{"line": {positions[i + 3]}, "column": {positions[i + 4]}}}}}}}'
+                for i in range(0, len(positions), POSITION_SIZE)
+            ))
+            f.write(']')
+            separator = ', '
+        f.write('}')
 
     def serialize(self) -> str:
-        return json.dumps(self, default=lambda o: o.__dict__)
\ No newline at end of file
+        """Get the positions as JSON, see write().
+
+        Returns:
+            The JSON string.
+        """
+        f = io.StringIO()
+        self.write(f)
+        return f.getvalue()
+
+    def save(self, file_path: str):
+        """Save the positions as JSON, see write(). A file path ending with '.gz' is gzip-compressed.
+
+        Args:
+            file_path: The path of the feature position file.
+        """
+        with (gzip.open(file_path, 'wt') if file_path.endswith('.gz') else open(file_path, 'w')) as f:
+            self.write(f)
+
+class NullPositionRecorder(PositionRecorder):
+    """A position recorder which records nothing, to only extract the features."""
+    __slots__ = ()
+
+    enabled = False
+
+    def add_record(self, feature_name: str, file_path: str, start_line: int, start_column: int, end_line: int, end_column: int):
+        pass
+
+    def merge(self, other: 'PositionRecorder') -> 'PositionRecorder':
+        return self
+
+def load_positions(file_path: str) -> dict:
+    """Load a feature position file, see PositionRecorder.save().
+
+    Args:
+        file_path: The path of the feature position file.
+
+    Returns:
+        The positions of every feature.
+    """
+    with (gzip.open(file_path, 'rt') if file_path.endswith('.gz') else open(file_path, 'r')) as f:
+        return json.load(f)
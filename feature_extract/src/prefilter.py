@@ -0,0 +1,212 @@
+import re
+import ast
+import base64
+
+from conf import SETTINGS
+
+from .package_feature import PackageFeature
+from .rules import (
+    INCLUDE_BASE64_STRING,
+    INCLUDE_DOMAIN,
+    INCLUDE_IP,
+    INCLUDE_SUSPICIOUS_STRING,
+    IMPORT_MODULE_RULES,
+    IMPORT_NAME_RULES,
+    CALL_NAME_RULES,
+    CALL_ATTRIBUTE_RULES
+)
+from .string_classifier import DOMAIN_STRING, BASE64_STRING, IP_STRING, SENSITIVE_STRING, classify_string
+from .ast_util import CONTROL_CHARACTER_REGEX, INSTALL_SCRIPT_PENDING_FEATURE_NAMES, PY_FILE_PENDING_FEATURE_NAMES
+from .source_util import is_ascii
+
+
+def get_rule_trigger_words() -> list:
+    """Get the words which a python file must contain for the import and call rules to match it.
+
+    An import rule needs the module name, and a call rule needs the function name, which is the attribute
+    name for the calls like os.system(...).
+
+    Returns:
+        The pairs of a rule and a word.
+    """
+    rule_words = [(rule, module_name) for module_name, rule in IMPORT_MODULE_RULES.items()]
+    rule_words += [(rule, name.rpartition('.')[2]) for name, rule in IMPORT_NAME_RULES.items()]
+    rule_words += [(rule, name) for name, rule in CALL_NAME_RULES.items()]
+    rule_words += [(rule, name) for (module_name, name), rule in CALL_ATTRIBUTE_RULES.items()]
+    return rule_words
+
+RULE_TRIGGER_WORDS = get_rule_trigger_words()
+# (feature names, is_in_setup_py) -> trigger words of the features and their regex, filled lazily
+TRIGGER_WORDS = {}
+
+# a comment, or a string literal without its prefix
+STRING_LITERAL_REGEX = re.compile(r'''#[^\n]*|\'\'\'(?:[^'\\]|\\.|'(?!''))*\'\'\'|"""(?:[^"\\]|\\.|"(?!""))*"""|'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*"''', re.DOTALL)
+STRING_PREFIXES = frozenset(['', 'r', 'u', 'b', 'f', 'br', 'rb', 'fr', 'rf'])
+IDENTIFIER_CHARACTERS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_')
+
+def get_trigger_words(feature_names: list, is_in_setup_py: bool) -> tuple:
+    """Get the trigger words of features and the regex which finds them in the raw content of a python file.
+
+    Args:
+        feature_names: The names of the features.
+        is_in_setup_py: Whether the file is setup.py.
+
+    Returns:
+        The trigger words, and the regex matching them as whole words, in one pass over the content.
+    """
+    key = (tuple(feature_names), is_in_setup_py)
+    if key not in TRIGGER_WORDS:
+        feature_names = set(feature_names)
+        words = sorted({word.encode() for rule, word in RULE_TRIGGER_WORDS if rule.get_feature_name(is_in_setup_py) in feature_names})
+        TRIGGER_WORDS[key] = (words, re.compile(rb'\b(?:' + b'|'.join(re.escape(word) for word in words) + rb')\b'))
+    return TRIGGER_WORDS[key]
+
+def has_trigger_word(data: bytes, feature_names: list, is_in_setup_py: bool) -> bool:
+    """Check whether the raw content of a python file contains a trigger word of features.
+
+    The words are searched as substrings first, which is much faster than the regex and usually rules
+    out the few rare features left to find in a package.
+
+    Args:
+        data: The raw content of the python file, see open_source().
+        feature_names: The names of the features.
+        is_in_setup_py: Whether the file is setup.py.
+
+    Returns:
+        True if a trigger word is in the content as a whole word.
+    """
+    words, trigger_regex = get_trigger_words(feature_names, is_in_setup_py)
+    for word in words:
+        if data.find(word) != -1:
+            return trigger_regex.search(data) is not None
+    return False
+
+def get_string_values(content: str) -> list:
+    """Get the values of the string literals of a python code, with the adjacent literals concatenated.
+
+    The literals are found by a scan of the comments and the string literals, and the brackets are counted
+    to tell the adjacent literals of an expression from the literals of consecutive statements.
+
+    Args:
+        content: The python code, with '\\n' line endings.
+
+    Returns:
+        The values of the string literals, or None if the code has bytes literals or f-strings, or if the
+        literals can not be told apart without parsing the code.
+    """
+    values = []
+    # the values of the current adjacent literals
+    parts = None
+    # the code since the last string literal, without the comments
+    code = ''
+    depth = 0
+    end = 0
+    for match in STRING_LITERAL_REGEX.finditer(content):
+        start = match.start()
+        code += content[end:start]
+        end = match.end()
+        token = match.group()
+        if token[0] == '#':
+            continue
+        if '"' in code or "'" in code:
+            # an unterminated string literal
+            return None
+        prefix_start = start
+        while prefix_start > 0 and content[prefix_start - 1] in IDENTIFIER_CHARACTERS:
+            prefix_start -= 1
+        prefix = content[prefix_start:start].lower()
+        if prefix not in STRING_PREFIXES or 'b' in prefix or 'f' in prefix:
+            return None
+        code = code[:len(code) - len(prefix)].replace('\\\n', '')
+        # the literals are concatenated unless code or the end of a statement is between them
+        if parts is not None and (code.strip() or ('\n' in code and depth <= 0)):
+            values.append(''.join(parts))
+            parts = None
+        depth += code.count('(') + code.count('[') + code.count('{') - code.count(')') - code.count(']') - code.count('}')
+        code = ''
+        quote_length = 3 if token.startswith(('"""', "'''")) else 1
+        if 'r' in prefix or '\\' not in token:
+            value = token[quote_length:len(token) - quote_length]
+        else:
+            try:
+                value = ast.literal_eval(token)
+            except Exception:
+                return None
+        if parts is None:
+            parts = [value]
+        else:
+            parts.append(value)
+    if "'" in content[end:] or '"' in content[end:]:
+        return None
+    if parts is not None:
+        values.append(''.join(parts))
+    return values
+
+def is_inert_string(value: str, is_in_setup_py: bool, pending_feature_names: set) -> bool:
+    """Check whether a string constant can not set any of the pending features, see visit_constant().
+
+    Args:
+        value: The value of the string.
+        is_in_setup_py: Whether the file is setup.py.
+        pending_feature_names: The features which are not set yet.
+
+    Returns:
+        True if the string sets none of the pending features.
+    """
+    categories = classify_string(value)
+    if not categories:
+        return True
+    for category, rule in ((DOMAIN_STRING, INCLUDE_DOMAIN), (IP_STRING, INCLUDE_IP), (SENSITIVE_STRING, INCLUDE_SUSPICIOUS_STRING)):
+        if categories & category and rule.get_feature_name(is_in_setup_py) in pending_feature_names:
+            return False
+    if not categories & BASE64_STRING:
+        return True
+    try:
+        payload = base64.b64decode(value)
+    except Exception:
+        return True
+    if INCLUDE_BASE64_STRING.get_feature_name(is_in_setup_py) in pending_feature_names:
+        return False
+    # only a payload which can be python code is analyzed, see get_payload_feature()
+    if SETTINGS['extract']['max_payload_depth'] <= 0 or len(payload) > SETTINGS['extract']['max_payload_bytes']:
+        return True
+    try:
+        content = payload.decode()
+    except UnicodeDecodeError:
+        return True
+    return not content.strip() or CONTROL_CHARACTER_REGEX.search(content) is not None
+
+def get_prefiltered_feature(data: bytes, is_in_setup_py: bool, pending_feature_names: list=None) -> PackageFeature:
+    """Check from the raw content of a python file whether the file can set any feature, without parsing it.
+
+    A file can only set a feature by name if it contains a trigger word of the rules, like 'subprocess' or
+    'eval', and otherwise only through its string constants. A file without trigger words and without
+    strings which set a feature, see visit_constant(), gets no features and only its longest string length.
+
+    Args:
+        data: The raw content of the python file, see open_source().
+        is_in_setup_py: Whether the file is setup.py.
+        pending_feature_names: The features which are not set yet, see get_feature_by_ast(). None to check
+            all the features.
+
+    Returns:
+        The features of the file, or None if the file must be analyzed.
+    """
+    if pending_feature_names is None:
+        pending_feature_names = INSTALL_SCRIPT_PENDING_FEATURE_NAMES if is_in_setup_py else PY_FILE_PENDING_FEATURE_NAMES
+    # the non-ASCII identifiers are normalized by the parser, so they may match the rules
+    if not is_ascii(data) or data.find(b'\x00') != -1:
+        return None
+    if has_trigger_word(data, pending_feature_names, is_in_setup_py):
+        return None
+    values = get_string_values(str(data, 'ascii').replace('\r\n', '\n').replace('\r', '\n'))
+    if values is None:
+        return None
+    pending_feature_names = set(pending_feature_names)
+    package_feature = PackageFeature()
+    for value in values:
+        if not is_inert_string(value, is_in_setup_py, pending_feature_names):
+            return None
+        if len(value) > package_feature.longest_string_length:
+            package_feature.longest_string_length = len(value)
+    return package_feature
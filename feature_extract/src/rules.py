@@ -0,0 +1,127 @@
+class Rule:
+    """A detection rule, tagged with the feature names it sets in setup.py and in other python files."""
+    __slots__ = ('install_script_feature', 'py_file_feature')
+
+    def __init__(self, install_script_feature: str, py_file_feature: str):
+        self.install_script_feature = install_script_feature
+        self.py_file_feature = py_file_feature
+
+    def get_feature_name(self, is_in_setup_py: bool) -> str:
+        """Get the feature name set by the rule.
+
+        Args:
+            is_in_setup_py: Whether the file is setup.py.
+
+        Returns:
+            The feature name.
+        """
+        return self.install_script_feature if is_in_setup_py else self.py_file_feature
+
+def feature_rule(feature: str) -> Rule:
+    """Create a rule setting the install script and the py file variants of a feature.
+
+    Args:
+        feature: The feature name without the '_in_install_script' or '_in_py_file' suffix.
+
+    Returns:
+        The rule.
+    """
+    return Rule(f'{feature}_in_install_script', f'{feature}_in_py_file')
+
+
+USE_BASE64_CONVERSION = feature_rule('use_base64_conversion')
+INCLUDE_BASE64_STRING = feature_rule('include_base64_string')
+DECODE_BASE64_STRING = feature_rule('decode_base64_string')
+INCLUDE_DOMAIN = feature_rule('include_domain')
+INCLUDE_IP = feature_rule('include_ip')
+INCLUDE_SUSPICIOUS_STRING = feature_rule('include_suspicious_string')
+USE_PROCESS = feature_rule('use_process')
+USE_FS = feature_rule('use_fs')
+USE_NETWORK = feature_rule('use_network')
+USE_ENV = feature_rule('use_env')
+USE_CRYPTO_AND_ZIP = feature_rule('use_crypto_and_zip')
+USE_EVAL = feature_rule('use_eval')
+USE_EXEC = feature_rule('use_exec')
+USE_OBFUSCATION = feature_rule('use_obfuscation')
+# os.system and friends count as process usage in setup.py only
+USE_OPERATING_SYSTEM = Rule('use_process_in_install_script', 'use_operating_system_in_py_file')
+# byte strings are always attributed to python files
+INCLUDE_BYTE_STRING = Rule('include_byte_string_in_py_file', 'include_byte_string_in_py_file')
+
+# top level module name -> rule, matched by import and from ... import statements
+IMPORT_MODULE_RULES = {
+    'base64': USE_BASE64_CONVERSION,
+    'os': USE_FS,
+    'shutil': USE_FS,
+    'tempfile': USE_FS,
+    'glob': USE_FS,
+    'pathlib': USE_FS,
+    'subprocess': USE_PROCESS,
+    'httplib': USE_NETWORK,
+    'urllib': USE_NETWORK,
+    'urllib2': USE_NETWORK,
+    'socket': USE_NETWORK,
+    'requests': USE_NETWORK,
+    'aiohttp': USE_NETWORK,
+    'selenium': USE_NETWORK,
+    'zlib': USE_CRYPTO_AND_ZIP,
+    'gzip': USE_CRYPTO_AND_ZIP,
+    'bz2': USE_CRYPTO_AND_ZIP,
+    'tarfile': USE_CRYPTO_AND_ZIP,
+}
+
+# full module name -> rule, matched by import statements
+IMPORT_NAME_RULES = {
+    'http.client': USE_NETWORK,
+    'dns.resolver': INCLUDE_DOMAIN,
+}
+
+# function name -> rule, matched by calls like eval(...)
+CALL_NAME_RULES = {
+    'open': USE_FS,
+    'read': USE_FS,
+    'write': USE_FS,
+    'eval': USE_EVAL,
+    'exec': USE_EXEC,
+    '__pyarmor__': USE_OBFUSCATION,
+}
+
+# (module name, function name) -> rule, matched by calls like os.system(...)
+CALL_ATTRIBUTE_RULES = {
+    **{('os', name): USE_OPERATING_SYSTEM for name in [
+        'system',
+        'execl', 'execle', 'execlp', 'execlpe', 'execv', 'execvp', 'execvpe',
+        'popen',
+        'spawnl', 'spawnle', 'spawnlp', 'spawnlpe', 'spawnv', 'spawnve', 'spawnvp', 'spawnvpe'
+    ]},
+    **{('os', name): USE_ENV for name in [
+        'getenv', 'putenv', 'unsetenv'
+    ]},
+    **{('subprocess', name): USE_PROCESS for name in [
+        'call', 'check_call', 'check_output', 'run', 'getoutput', 'getstatusoutput'
+    ]},
+    ('base64', 'b64decode'): DECODE_BASE64_STRING,
+}
+
+RULES = [
+    USE_BASE64_CONVERSION,
+    INCLUDE_BASE64_STRING,
+    DECODE_BASE64_STRING,
+    INCLUDE_DOMAIN,
+    INCLUDE_IP,
+    INCLUDE_SUSPICIOUS_STRING,
+    USE_PROCESS,
+    USE_FS,
+    USE_NETWORK,
+    USE_ENV,
+    USE_CRYPTO_AND_ZIP,
+    USE_EVAL,
+    USE_EXEC,
+    USE_OBFUSCATION,
+    USE_OPERATING_SYSTEM,
+    INCLUDE_BYTE_STRING,
+]
+
+# the features which the rules can set in setup.py and in other python files
+INSTALL_SCRIPT_FEATURE_NAMES = tuple(dict.fromkeys(rule.install_script_feature for rule in RULES))
+PY_FILE_FEATURE_NAMES = tuple(dict.fromkeys(rule.py_file_feature for rule in RULES))
@@ -0,0 +1,236 @@
+import os
+import time
+import shutil
+import traceback
+
+from .archive_util import ArchiveLimitExceededError, get_package_name, get_archive_limits, add_mode, hash_file, load_manifest, save_manifest
+
+
+def remove_path(path: str):
+    """Remove a file, a symbolic link or a folder.
+
+    Args:
+        path: Path to remove.
+    """
+    if os.path.islink(path) or not os.path.isdir(path):
+        os.remove(path)
+        return
+    try:
+        shutil.rmtree(path)
+    except PermissionError:
+        add_mode(path)
+        shutil.rmtree(path)
+
+def get_directory_size(dir_path: str) -> int:
+    """Get the total size of the files in a folder.
+
+    Args:
+        dir_path: Folder path.
+
+    Returns:
+        The total size in bytes.
+    """
+    size = 0
+    for root, _, file_names in os.walk(dir_path):
+        for file_name in file_names:
+            try:
+                size += os.lstat(os.path.join(root, file_name)).st_size
+            except OSError:
+                pass
+    return size
+
+class ScratchDirectory:
+    """A disk-bounded folder of decompressed packages.
+
+    Every archive is decompressed once into a content-addressed cache (objects/<sha256>) shared by all
+    datasets, and the folder of a dataset (datasets/<dataset_name>) links each package to its cached copy.
+    The dataset folders are kept apart from the cache, so no dataset name can collide with it. A manifest per dataset
+    records the digest of every archive, so a rebuild only hashes and decompresses new or changed archives.
+    An index records the size of every cached package in least recently used order, so the least recently
+    used packages are evicted once the cache grows over its byte budget. Packages in use are pinned and are
+    never evicted. The manifests and the index are written by save().
+    """
+    def __init__(self, path: str, max_bytes: int = 0):
+        """
+        Args:
+            path: The path of the scratch folder.
+            max_bytes: The byte budget of the cached packages, 0 for no limit.
+        """
+        self.path = os.path.abspath(path)
+        self.objects_path = os.path.join(self.path, 'objects')
+        self.datasets_path = os.path.join(self.path, 'datasets')
+        self.index_path = os.path.join(self.path, 'index.json')
+        self.max_bytes = max_bytes
+        self.manifests = {}
+        self.pins = {}
+        os.makedirs(self.objects_path, exist_ok=True)
+        # reconcile the index with the cached packages on disk
+        index = load_manifest(self.index_path)
+        entries = {}
+        for sha256 in os.listdir(self.objects_path):
+            object_path = os.path.join(self.objects_path, sha256)
+            if sha256.endswith('.tmp') or not os.path.isdir(object_path):
+                continue
+            entry = index.get(sha256)
+            if entry is None:
+                entry = {'size': get_directory_size(object_path), 'last_used': os.path.getmtime(object_path)}
+            entries[sha256] = entry
+        self.index = dict(sorted(entries.items(), key=lambda item: item[1]['last_used']))
+        self.total_size = sum(entry['size'] for entry in self.index.values())
+
+    def get_dataset_path(self, dataset_path: str) -> str:
+        """Get the folder linking the packages of a dataset.
+
+        Args:
+            dataset_path: Path of dataset.
+
+        Returns:
+            Path of decompressed dataset.
+        """
+        return os.path.join(self.datasets_path, os.path.basename(os.path.normpath(dataset_path)))
+
+    def get_manifest(self, dataset_path: str) -> dict:
+        """Get the manifest of a dataset, which maps every archive to its size, mtime and digest.
+
+        Args:
+            dataset_path: Path of dataset.
+
+        Returns:
+            The manifest.
+        """
+        manifest_path = f'{self.get_dataset_path(dataset_path)}.manifest.json'
+        if manifest_path not in self.manifests:
+            self.manifests[manifest_path] = load_manifest(manifest_path)
+        return self.manifests[manifest_path]
+
+    def prune(self, dataset_path: str):
+        """Forget the archives which are no longer in a dataset.
+
+        Args:
+            dataset_path: Path of dataset.
+        """
+        temp_dataset_path = self.get_dataset_path(dataset_path)
+        os.makedirs(temp_dataset_path, exist_ok=True)
+        manifest = self.get_manifest(dataset_path)
+        file_names = set(os.listdir(dataset_path))
+        for file_name in list(manifest):
+            if file_name not in file_names:
+                del manifest[file_name]
+        package_names = {get_package_name(file_name) for file_name in file_names}
+        for package_name in os.listdir(temp_dataset_path):
+            if package_name not in package_names:
+                package_path = os.path.join(temp_dataset_path, package_name)
+                try:
+                    remove_path(package_path)
+                except Exception:
+                    print(f'Error: Delete temp package {package_path} failed.')
+                    traceback.print_exc()
+
+    def acquire(self, dataset_path: str, file_name: str, use_cache: bool = False, sha256: str = None) -> str:
+        """Pin the cached copy of an archive and link it into the folder of its dataset.
+
+        The archive is not decompressed here, see decompress_archive(); pinning it first guarantees the
+        cached copy is not evicted while it is decompressed and analyzed.
+
+        Args:
+            dataset_path: Path of dataset.
+            file_name: The file name of the archive.
+            use_cache: Trust the manifest instead of re-hashing an unchanged archive.
+            sha256: The digest of the archive if it is already known, so it is not hashed again.
+
+        Returns:
+            The path of the decompressed package.
+
+        Throws:
+            ArchiveLimitExceededError: If the unchanged archive was already skipped for exceeding the current archive limits.
+        """
+        temp_dataset_path = self.get_dataset_path(dataset_path)
+        os.makedirs(temp_dataset_path, exist_ok=True)
+        manifest = self.get_manifest(dataset_path)
+        file_path = os.path.join(dataset_path, file_name)
+        stat = os.stat(file_path)
+        entry = manifest.get(file_name)
+        if use_cache and entry is not None and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            if entry.get('skipped'):
+                if entry.get('limits') == get_archive_limits():
+                    raise ArchiveLimitExceededError(entry['skipped'])
+                # the archive is retried under the new archive limits
+                del entry['skipped']
+                entry.pop('limits', None)
+            sha256 = entry['sha256']
+        else:
+            if sha256 is None:
+                sha256 = hash_file(file_path)
+            manifest[file_name] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'sha256': sha256}
+        self.pins[sha256] = self.pins.get(sha256, 0) + 1
+        # link the package of the dataset to the cache
+        package_path = os.path.join(temp_dataset_path, get_package_name(file_name))
+        object_link = os.path.join('..', '..', 'objects', sha256)
+        if os.path.lexists(package_path) and (not os.path.islink(package_path) or os.readlink(package_path) != object_link):
+            remove_path(package_path)
+        if not os.path.lexists(package_path):
+            os.symlink(object_link, package_path)
+        return package_path
+
+    def skip(self, dataset_path: str, file_name: str, reason: str):
+        """Record that an archive exceeds the archive limits, so it is not retried while it is unchanged.
+
+        Args:
+            dataset_path: Path of dataset.
+            file_name: The file name of the archive.
+            reason: The exceeded limit.
+        """
+        manifest = self.get_manifest(dataset_path)
+        if file_name in manifest:
+            manifest[file_name]['skipped'] = reason
+            manifest[file_name]['limits'] = get_archive_limits()
+
+    def touch(self, sha256: str):
+        """Mark a cached package as the most recently used one.
+
+        Args:
+            sha256: The digest of the package archive.
+        """
+        entry = self.index.pop(sha256, None)
+        if entry is None:
+            entry = {'size': get_directory_size(os.path.join(self.objects_path, sha256))}
+            self.total_size += entry['size']
+        entry['last_used'] = time.time()
+        self.index[sha256] = entry
+
+    def release(self, package_path: str):
+        """Unpin a decompressed package and evict the least recently used packages over the byte budget.
+
+        Args:
+            package_path: The path of the decompressed package.
+        """
+        sha256 = os.path.basename(os.readlink(package_path))
+        self.pins[sha256] -= 1
+        if self.pins[sha256] == 0:
+            del self.pins[sha256]
+        if os.path.isdir(os.path.join(self.objects_path, sha256)):
+            self.touch(sha256)
+        self.evict()
+
+    def evict(self):
+        """Evict the least recently used unpinned packages until the cache fits in the byte budget."""
+        if not self.max_bytes or self.total_size <= self.max_bytes:
+            return
+        for sha256 in list(self.index):
+            if self.total_size <= self.max_bytes:
+                break
+            if sha256 in self.pins:
+                continue
+            try:
+                remove_path(os.path.join(self.objects_path, sha256))
+            except Exception:
+                print(f'Error: Evict the cached package {sha256} failed.')
+                traceback.print_exc()
+                continue
+            self.total_size -= self.index.pop(sha256)['size']
+
+    def save(self):
+        """Save the manifests of the datasets and the index of the cached packages."""
+        for manifest_path, manifest in self.manifests.items():
+            save_manifest(manifest, manifest_path)
+        save_manifest(self.index, self.index_path)
@@ -0,0 +1,89 @@
+import io
+import os
+import re
+import mmap
+import tokenize
+from contextlib import contextmanager
+
+from conf import SETTINGS
+
+
+NON_ASCII_REGEX = re.compile(rb'[^\x00-\x7f]')
+
+@contextmanager
+def open_source(file_path: str):
+    """Read the raw content of a source file once, to share it between the analyzers of the file.
+
+    The files of at least mmap_threshold_bytes are memory-mapped instead of read, and are unmapped when
+    the context exits.
+
+    Args:
+        file_path: The path of the source file.
+
+    Yields:
+        The raw content of the file, as bytes or as a read-only mmap.
+
+    Throws:
+        OSError: If the file cannot be read.
+    """
+    with open(file_path, 'rb') as f:
+        threshold = SETTINGS['extract']['mmap_threshold_bytes']
+        if threshold and os.fstat(f.fileno()).st_size >= threshold:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+        else:
+            yield f.read()
+
+def is_ascii(data) -> bool:
+    """Check whether the raw content of a source file is ASCII.
+
+    Args:
+        data: The raw content of the file, see open_source().
+
+    Returns:
+        True if all the bytes are ASCII.
+    """
+    if type(data) is bytes:
+        return data.isascii()
+    return NON_ASCII_REGEX.search(data) is None
+
+def decode_source(data) -> str:
+    """Decode a source file the way the python interpreter does.
+
+    The encoding is given by the BOM or the PEP 263 coding cookie of the first two lines, UTF-8 by default.
+    The line endings are converted to '\\n' like a text mode open() does.
+
+    Args:
+        data: The raw content of the file, see open_source().
+
+    Returns:
+        The decoded content with universal newlines.
+
+    Throws:
+        SyntaxError: If the coding cookie is invalid or names an unknown encoding.
+        UnicodeDecodeError: If the content is not valid in its encoding.
+    """
+    if type(data) is bytes:
+        readline = io.BytesIO(data).readline
+    else:
+        data.seek(0)
+        readline = data.readline
+    encoding, _ = tokenize.detect_encoding(readline)
+    return str(data, encoding).replace('\r\n', '\n').replace('\r', '\n')
+
+def decode_source_or_utf8(data) -> str:
+    """Decode a source file like decode_source(), or as UTF-8 if its encoding is invalid.
+
+    A file with a bogus coding cookie or with bytes which are not valid in its encoding is still analyzed,
+    with the invalid bytes replaced.
+
+    Args:
+        data: The raw content of the file, see open_source().
+
+    Returns:
+        The decoded content with universal newlines.
+    """
+    try:
+        return decode_source(data)
+    except (SyntaxError, UnicodeDecodeError):
+        return str(data, 'utf-8', 'replace').replace('\r\n', '\n').replace('\r', '\n')
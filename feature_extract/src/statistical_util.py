@@ -1,9 +1,34 @@
 import math
 import zlib
 
+import numpy
+
+from .source_util import open_source, decode_source_or_utf8
+
+# the size of the chunks a large input is compressed in
+COMPRESSION_CHUNK_SIZE = 1 << 20
+
+def get_histogram(data: str) -> numpy.ndarray:
+    """Count the characters of data below 256 in one pass.
+
+    Args:
+        data: The data to count the characters of.
+
+    Returns:
+        The number of occurrences of every character code from 0 to 255.
+    """
+    if data.isascii():
+        codes = numpy.frombuffer(memoryview(data.encode('ascii')), dtype=numpy.uint8)
+    else:
+        codes = numpy.frombuffer(memoryview(data.encode('utf-32-le')), dtype='<u4')
+        codes = codes[codes < 256]
+    return numpy.bincount(codes, minlength=256)
+
 def calculate_entropy(data: str) -> float:
     """Calculate the information entropy of data.
 
+    The spaces are left out, and the characters above 255 count in the length of the data only.
+
     Args:
         data: The data to calculate the information entropy.
 
@@ -12,12 +37,15 @@ def calculate_entropy(data: str) -> float:
     """
     if not data:
         return 0
+    histogram = get_histogram(data)
+    length = len(data) - int(histogram[ord(' ')])
+    if length == 0:
+        return 0
+    histogram[ord(' ')] = 0
     entropy = 0
-    stripped_data = data.replace(' ', '')
-    for x in range(256):
-        p_x = float(stripped_data.count(chr(x))) / len(stripped_data)
-        if p_x > 0:
-            entropy += - p_x * math.log(p_x, 2)
+    for count in histogram[histogram > 0].tolist():
+        p_x = float(count) / length
+        entropy += - p_x * math.log(p_x, 2)
     return entropy
 
 def calculate_entropy_from_file(file_path: str) -> float:
@@ -32,25 +60,45 @@ def calculate_entropy_from_file(file_path: str) -> float:
     Throws:
         FileNotFoundError: If the file does not exist.
     """
-    with open(file_path, 'r') as f:
-        data = f.read()
-    return calculate_entropy(data)
+    with open_source(file_path) as data:
+        return calculate_entropy(decode_source_or_utf8(data))
 
 def calculate_compression_ratio(data: bytes) -> float:
     """Calculate the compression ratio of data.
 
+    A large input is compressed in chunks, and only the size of the compressed data is kept.
+
     Args:
-        data: The data to calculate the compression ratio.
+        data: The data to calculate the compression ratio, bytes or a buffer like an mmap.
 
     Returns:
         The compression ratio.
     """
-    if not data:
+    if not len(data):
         return 0
-    compressed = zlib.compress(data)
-    ratio =  float(len(data)) / float(len(compressed))
+    if len(data) <= COMPRESSION_CHUNK_SIZE:
+        compressed_size = len(zlib.compress(data))
+    else:
+        compressed_size = get_compressed_size(data)
+    ratio =  float(len(data)) / float(compressed_size)
     return ratio
 
+def get_compressed_size(data: bytes) -> int:
+    """Compress data in chunks and get the size of the compressed data, which is not kept.
+
+    Args:
+        data: The data to compress, bytes or a buffer like an mmap.
+
+    Returns:
+        The size of the compressed data, the same as the size of zlib.compress(data).
+    """
+    compressor = zlib.compressobj()
+    compressed_size = 0
+    with memoryview(data) as view:
+        for i in range(0, len(view), COMPRESSION_CHUNK_SIZE):
+            compressed_size += len(compressor.compress(view[i:i + COMPRESSION_CHUNK_SIZE]))
+    return compressed_size + len(compressor.flush())
+
 def calculate_compression_ratio_from_file(file_path: str) -> float:
     """Calculate the compression ratio of a file.
 
@@ -63,6 +111,37 @@ def calculate_compression_ratio_from_file(file_path: str) -> float:
     Throws:
         FileNotFoundError: If the file does not exist.
     """
-    with open(file_path, 'rb') as f:
-        data = f.read()
-    return calculate_compression_ratio(data)
\ No newline at end of file
+    with open_source(file_path) as data:
+        return calculate_compression_ratio(data)
+
+def calculate_statistics(buffers: list) -> tuple:
+    """Calculate the information entropy and the compression ratio of many source files at once.
+
+    Every buffer is decoded and counted once and compressed once. The entropies are then computed together
+    from the histograms of all the buffers. Like for setup.py, the entropy is calculated on the decoded
+    content, see calculate_entropy(), and the compression ratio on the raw content.
+
+    Args:
+        buffers: The raw contents of the files, see open_source().
+
+    Returns:
+        The float64 arrays of the entropy and of the compression ratio of every buffer.
+    """
+    histograms = numpy.zeros((len(buffers), 256), dtype=numpy.int64)
+    lengths = numpy.zeros(len(buffers), dtype=numpy.float64)
+    compression_ratios = numpy.zeros(len(buffers), dtype=numpy.float64)
+    for i, data in enumerate(buffers):
+        if not len(data):
+            continue
+        content = decode_source_or_utf8(data)
+        histograms[i] = get_histogram(content)
+        lengths[i] = len(content)
+        compression_ratios[i] = len(data) / get_compressed_size(data)
+    # the spaces are left out
+    lengths -= histograms[:, ord(' ')]
+    histograms[:, ord(' ')] = 0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        probabilities = histograms / lengths[:, numpy.newaxis]
+        terms = numpy.where(histograms > 0, -probabilities * numpy.log2(probabilities), 0)
+    entropies = numpy.where(lengths > 0, terms.sum(axis=1), 0)
+    return entropies, compression_ratios
@@ -0,0 +1,71 @@
+import re
+
+from conf import SETTINGS
+from .patterns import DOMAIN_SEARCH_PATTERN, IP_SEARCH_PATTERN, SENSITIVE_STRING_SEARCH_PATTERN, BASE64_ALPHABET_PATTERN
+
+
+# the categories of a string, combined as bit flags
+DOMAIN_STRING = 1
+BASE64_STRING = 2
+IP_STRING = 4
+SENSITIVE_STRING = 8
+
+DOMAIN_REGEX = re.compile(DOMAIN_SEARCH_PATTERN)
+BASE64_ALPHABET_REGEX = re.compile(BASE64_ALPHABET_PATTERN)
+IP_REGEX = re.compile(IP_SEARCH_PATTERN)
+SENSITIVE_STRING_REGEX = re.compile(SENSITIVE_STRING_SEARCH_PATTERN)
+
+# the number of leading characters of a string searched for domains, ips and sensitive strings, 0 for all
+STRING_SCAN_WINDOW = SETTINGS['extract']['string_scan_window']
+
+def is_base64_string(value: str) -> bool:
+    """Check whether a string matches BASE64_PATTERN in linear time.
+
+    Like the '$' of the pattern, one trailing newline is ignored. An empty string matches.
+
+    Args:
+        value: The string.
+
+    Returns:
+        True if the string is base64 encoded.
+    """
+    if value.endswith('\n'):
+        value = value[:-1]
+    if len(value) % 4 != 0:
+        return False
+    if value.endswith('=='):
+        value = value[:-2]
+    elif value.endswith('='):
+        value = value[:-1]
+    return BASE64_ALPHABET_REGEX.fullmatch(value) is not None
+
+def classify_string(value: str) -> int:
+    """Match a string against all the patterns at once.
+
+    Cheap checks skip the patterns which can not match: domains and ips need a '.', the sensitive strings
+    are paths or dot files and need a '/' or a '.', and a base64 string, which spans the whole string
+    except for one trailing newline, needs a length that is a multiple of 4. Most string constants are
+    words or identifiers and are only checked for base64.
+
+    Every check runs in linear time. Domains, ips and sensitive strings are only searched in the first
+    STRING_SCAN_WINDOW characters when the window is set, while a base64 string always spans the whole string.
+
+    Args:
+        value: The string.
+
+    Returns:
+        The matched categories, a combination of DOMAIN_STRING, BASE64_STRING, IP_STRING and SENSITIVE_STRING.
+    """
+    categories = 0
+    if is_base64_string(value):
+        categories |= BASE64_STRING
+    if STRING_SCAN_WINDOW and len(value) > STRING_SCAN_WINDOW:
+        value = value[:STRING_SCAN_WINDOW]
+    has_dot = '.' in value
+    if has_dot and DOMAIN_REGEX.search(value):
+        categories |= DOMAIN_STRING
+    if has_dot and IP_REGEX.search(value):
+        categories |= IP_STRING
+    if (has_dot or '/' in value) and SENSITIVE_STRING_REGEX.search(value):
+        categories |= SENSITIVE_STRING
+    return categories
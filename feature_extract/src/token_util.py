@@ -0,0 +1,337 @@
+import io
+import ast
+import keyword
+import tokenize
+
+from .package_feature import PackageFeature
+from .position_recorder import PositionRecorder
+from .ast_util import NODE_VISITORS, PayloadBudget, get_feature_by_ast
+
+
+# tokens which are not part of an expression
+NON_CODE_TOKEN_TYPES = (tokenize.NL, tokenize.COMMENT, tokenize.INDENT, tokenize.DEDENT)
+# operators after which a new statement starts
+STATEMENT_SEPARATORS = (';', ':')
+
+def get_string_value(token_string: str):
+    """Get the value of a string literal token.
+
+    Args:
+        token_string: The string literal, with its prefix and quotes.
+
+    Returns:
+        The value of the string literal. The f-strings and the literals with prefixes unknown to python 3
+        are returned without their prefix and quotes, as the raw text of the literal.
+    """
+    try:
+        return ast.literal_eval(token_string)
+    except Exception:
+        pass
+    prefix_length = 0
+    while token_string[prefix_length] not in '\'"':
+        prefix_length += 1
+    quote_length = 3 if token_string[prefix_length:prefix_length + 3] in ('"""', "'''") else 1
+    body = token_string[prefix_length + quote_length:len(token_string) - quote_length]
+    return body.encode('utf-8', errors='ignore') if 'b' in token_string[:prefix_length].lower() else body
+
+def is_f_string(token_string: str) -> bool:
+    """Check whether a string literal token is an f-string.
+
+    Args:
+        token_string: The string literal, with its prefix and quotes.
+
+    Returns:
+        True if the prefix of the literal contains 'f'.
+    """
+    for character in token_string:
+        if character in '\'"':
+            return False
+        if character in 'fF':
+            return True
+    return False
+
+class TokenFeatureExtractor:
+    """Extract the features of python code from its token stream, without building an ast tree.
+
+    The imports, the calls of names and of attributes of names, and the string and bytes literals are
+    recognized from the tokens and are passed to the visitors of ast_util as the ast nodes they would have
+    been parsed into, so the rules and the recorded positions are the same as for the ast tree. The
+    extractor is used for the files which can not be parsed, like python 2 code.
+    """
+    def __init__(self, content: str, is_in_setup_py: bool, position_recorder: PositionRecorder, file_path: str, pending_feature_names: list):
+        """
+        Args:
+            content: The python code.
+            is_in_setup_py: Whether the file is setup.py.
+            position_recorder: The position recorder.
+            file_path: The path of the python code file.
+            pending_feature_names: The features which are not set yet, see get_feature_by_ast().
+        """
+        self.content = content
+        self.lines = content.split('\n')
+        self.is_in_setup_py = is_in_setup_py
+        self.position_recorder = position_recorder
+        self.file_path = file_path
+        self.pending_feature_names = pending_feature_names
+        self.payload_budget = PayloadBudget()
+        self.package_feature = PackageFeature()
+        # the last tokens of the code, most recent last
+        self.previous_tokens = []
+        # the open brackets, with the call started by each of them
+        self.brackets = []
+        # the tokens of the current import statement
+        self.import_tokens = None
+        # the adjacent string literals, which are concatenated
+        self.string_tokens = []
+        self.is_statement_start = True
+        # the exec keyword of a python 2 exec statement
+        self.exec_token = None
+
+    def extract(self) -> PackageFeature:
+        """Extract the features of the code. The features found before a tokenize error are kept.
+
+        Returns:
+            The features of the code.
+        """
+        try:
+            for token in tokenize.generate_tokens(io.StringIO(self.content).readline):
+                if self.visit_token(token):
+                    break
+        except (tokenize.TokenError, SyntaxError):
+            pass
+        self.flush_strings()
+        return self.package_feature
+
+    def get_position(self, row: int, column: int) -> tuple:
+        """Convert a token position to an ast position, whose column is counted in UTF-8 bytes.
+
+        Args:
+            row: The line number of the token.
+            column: The character offset of the token in the line.
+
+        Returns:
+            The line number and the byte offset.
+        """
+        line = self.lines[row - 1] if row <= len(self.lines) else ''
+        if line.isascii():
+            return row, column
+        return row, len(line[:column].encode('utf-8'))
+
+    def visit(self, node, start: tuple, end: tuple) -> bool:
+        """Pass a node built from tokens to its ast visitor.
+
+        Args:
+            node: The ast node.
+            start: The start position of the first token of the node.
+            end: The end position of the last token of the node.
+
+        Returns:
+            True if all the pending features are set, so the rest of the code can be skipped.
+        """
+        node.lineno, node.col_offset = self.get_position(*start)
+        node.end_lineno, node.end_col_offset = self.get_position(*end)
+        if not NODE_VISITORS[type(node)](node, self.package_feature, self.is_in_setup_py, self.position_recorder, self.file_path, self.payload_budget):
+            return False
+        return self.update_pending_feature_names()
+
+    def update_pending_feature_names(self) -> bool:
+        """Forget the pending features which are set.
+
+        Returns:
+            True if all the pending features are set.
+        """
+        if self.pending_feature_names is None:
+            return False
+        self.pending_feature_names = [feature_name for feature_name in self.pending_feature_names if not self.package_feature.has_feature(feature_name)]
+        return not self.pending_feature_names
+
+    def flush_strings(self) -> bool:
+        """Visit the adjacent string literals as one constant.
+
+        Returns:
+            True if all the pending features are set.
+        """
+        if not self.string_tokens:
+            return False
+        string_tokens = self.string_tokens
+        self.string_tokens = []
+        if any(is_f_string(token.string) for token in string_tokens):
+            return self.visit_f_string(string_tokens)
+        values = [get_string_value(token.string) for token in string_tokens]
+        if all(type(value) is bytes for value in values):
+            value = b''.join(values)
+        else:
+            value = ''.join(value if type(value) is str else value.decode('utf-8', errors='ignore') for value in values)
+        return self.visit(ast.Constant(value=value), string_tokens[0].start, string_tokens[-1].end)
+
+    def visit_f_string(self, string_tokens: list) -> bool:
+        """Visit adjacent string literals including an f-string, which are parsed into an ast tree like in the code.
+
+        Args:
+            string_tokens: The string literal tokens.
+
+        Returns:
+            True if all the pending features are set.
+        """
+        (start_row, start_column), (end_row, end_column) = string_tokens[0].start, string_tokens[-1].end
+        text = '\n'.join(self.lines[start_row - 1:end_row])
+        text = text[start_column:len(text) - len(self.lines[end_row - 1]) + end_column]
+        # the expression is indented to the column of the literals, and wrapped in parentheses for the line breaks
+        byte_column = self.get_position(start_row, start_column)[1]
+        try:
+            if byte_column > 0:
+                tree = ast.parse('(' + ' ' * (byte_column - 1) + text + ')', mode='eval')
+            else:
+                tree = ast.parse(text, mode='eval')
+        except Exception:
+            return False
+        ast.increment_lineno(tree, start_row - 1)
+        self.package_feature.merge(get_feature_by_ast(tree, self.is_in_setup_py, self.position_recorder, self.file_path, None, self.payload_budget))
+        return self.update_pending_feature_names()
+
+    def visit_import_statement(self) -> bool:
+        """Visit the tokens of an import or a from ... import statement.
+
+        Returns:
+            True if all the pending features are set.
+        """
+        tokens = self.import_tokens
+        self.import_tokens = None
+        if tokens[0].string == 'import':
+            names = []
+            name = ''
+            is_alias = False
+            for token in tokens[1:] + [None]:
+                if token is None or token.string == ',':
+                    if name:
+                        names.append(ast.alias(name=name))
+                    name = ''
+                    is_alias = False
+                elif token.string == 'as':
+                    is_alias = True
+                elif not is_alias and token.type in (tokenize.NAME, tokenize.OP) and token.string != '(' and token.string != ')':
+                    name += token.string
+            node = ast.Import(names=names)
+        else:
+            module = ''
+            for token in tokens[1:]:
+                if token.string == 'import':
+                    break
+                if token.type == tokenize.NAME or (module and token.string == '.'):
+                    module += token.string
+            node = ast.ImportFrom(module=module or None, names=[], level=0)
+        return self.visit(node, tokens[0].start, tokens[-1].end)
+
+    def visit_bracket(self, token) -> bool:
+        """Track the brackets, and visit a call when its parenthesis is closed.
+
+        Args:
+            token: The bracket token.
+
+        Returns:
+            True if all the pending features are set.
+        """
+        if token.string in '([{':
+            call = None
+            if token.string == '(':
+                call = self.get_call()
+            self.brackets.append(call)
+            return False
+        if not self.brackets:
+            return False
+        call = self.brackets.pop()
+        if call is None:
+            return False
+        node, start = call
+        return self.visit(node, start, token.end)
+
+    def get_call(self) -> tuple:
+        """Get the call started by an opening parenthesis, from the tokens before it.
+
+        Returns:
+            The call node and its start position, or None if the parenthesis does not start a call of a
+            name or of an attribute of a name.
+        """
+        tokens = self.previous_tokens
+        if not tokens or tokens[-1].type != tokenize.NAME or keyword.iskeyword(tokens[-1].string):
+            return None
+        if len(tokens) >= 2 and tokens[-2].string in ('def', 'class'):
+            return None
+        if len(tokens) >= 2 and tokens[-2].string == '.':
+            # the value of the attribute must be a name
+            if len(tokens) < 3 or tokens[-3].type != tokenize.NAME or keyword.iskeyword(tokens[-3].string):
+                return None
+            if len(tokens) >= 4 and tokens[-4].string == '.':
+                return None
+            func = ast.Attribute(value=ast.Name(id=tokens[-3].string), attr=tokens[-1].string)
+            return ast.Call(func=func, args=[], keywords=[]), tokens[-3].start
+        return ast.Call(func=ast.Name(id=tokens[-1].string), args=[], keywords=[]), tokens[-1].start
+
+    def visit_token(self, token) -> bool:
+        """Visit the next token of the code.
+
+        Args:
+            token: The token.
+
+        Returns:
+            True if all the pending features are set, so the rest of the code can be skipped.
+        """
+        if token.type in NON_CODE_TOKEN_TYPES:
+            if token.type != tokenize.NL and token.type != tokenize.COMMENT:
+                self.is_statement_start = True
+            return False
+        if token.type == tokenize.STRING:
+            if self.exec_token is not None:
+                # the exec statement of python 2 is visited as a call of exec()
+                exec_token = self.exec_token
+                self.exec_token = None
+                if self.visit(ast.Call(func=ast.Name(id='exec'), args=[], keywords=[]), exec_token.start, token.end):
+                    return True
+            self.string_tokens.append(token)
+            self.is_statement_start = False
+            return False
+        if self.exec_token is not None and token.type == tokenize.NAME and not keyword.iskeyword(token.string):
+            # the exec statement of a variable, e.g. exec code in globals()
+            exec_token = self.exec_token
+            self.exec_token = None
+            if self.visit(ast.Call(func=ast.Name(id='exec'), args=[], keywords=[]), exec_token.start, token.end):
+                return True
+        self.exec_token = None
+        if self.flush_strings():
+            return True
+        is_statement_end = token.type in (tokenize.NEWLINE, tokenize.ENDMARKER) or (token.string in STATEMENT_SEPARATORS and not self.brackets)
+        if self.import_tokens is not None:
+            if is_statement_end:
+                if self.visit_import_statement():
+                    return True
+            else:
+                self.import_tokens.append(token)
+                return False
+        if self.is_statement_start and token.string in ('import', 'from'):
+            self.import_tokens = [token]
+            self.is_statement_start = False
+            return False
+        if self.is_statement_start and token.string == 'exec':
+            self.exec_token = token
+        self.is_statement_start = is_statement_end
+        if token.type == tokenize.OP and token.string in '()[]{}' and self.visit_bracket(token):
+            return True
+        self.previous_tokens.append(token)
+        if len(self.previous_tokens) > 4:
+            del self.previous_tokens[0]
+        return False
+
+def get_feature_by_tokens(content: str, is_in_setup_py: bool=False, position_recorder: PositionRecorder=None, file_path: str='', pending_feature_names: list=None) -> PackageFeature:
+    """Get the feature of a python code from its tokens, see TokenFeatureExtractor.
+
+    Args:
+        content: The python code.
+        is_in_setup_py: Whether the file is in setup.py.
+        position_recorder: The position recorder.
+        file_path: The path of the python code file.
+        pending_feature_names: The features which are not set yet, see get_feature_by_ast().
+
+    Returns:
+        The feature of the python code.
+    """
+    return TokenFeatureExtractor(content, is_in_setup_py, position_recorder, file_path, pending_feature_names).extract()
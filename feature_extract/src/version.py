@@ -0,0 +1,15 @@
+from conf import SETTINGS
+
+
+# the version of the feature extractor, to bump whenever a change of the extractor changes the features or the
+# positions of a file, which invalidates the cached and the extracted features
+EXTRACTOR_VERSION = 4
+
+def get_extractor_version() -> str:
+    """Get the version of the features extracted with the current settings.
+
+    Returns:
+        The extractor version and the settings which change the features.
+    """
+    settings = SETTINGS['extract']
+    return f'{EXTRACTOR_VERSION}-{settings["string_scan_window"]}-{settings["max_payload_depth"]}-{settings["max_payload_bytes"]}'
@@ -0,0 +1,243 @@
+import os
+import json
+import stat
+import time
+import queue
+import tempfile
+import multiprocessing
+import threading
+import traceback
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import Future, ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+
+import numpy
+
+from training import predict_packages_with_probability, reload_model
+from feature_extract import get_feature_by_archive, get_package_name, ArchiveLimitExceededError
+
+# the size of the chunks an uploaded archive is read in
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+
+def extract_archive_vector(archive_path: str, file_workers: int) -> numpy.ndarray:
+    """Extract the feature vector of a package archive, in a worker process.
+
+    Args:
+        archive_path: Path of package archive.
+        file_workers: Number of worker processes to analyze the files of a large package with.
+
+    Returns:
+        The feature vector of the package.
+    """
+    package_feature, _ = get_feature_by_archive(archive_path, file_workers, True)
+    return package_feature.to_vector()
+
+class MicroBatcher:
+    """Predict the feature vectors of concurrent requests together.
+
+    A thread takes the vectors waiting in a queue, waits at most max_batch_delay seconds for more, and
+    predicts up to max_batch_size vectors with one call of the model.
+    """
+    def __init__(self, model_name: str, max_batch_size: int, max_batch_delay: float):
+        """
+        Args:
+            model_name: The model name, MLP, NB, SVM or RF.
+            max_batch_size: The maximum number of vectors predicted at once.
+            max_batch_delay: The maximum time to wait for more vectors, in seconds.
+        """
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_batch_delay = max_batch_delay
+        self.requests = queue.Queue()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def submit(self, feature_vector: numpy.ndarray) -> Future:
+        """Queue a feature vector to predict.
+
+        Args:
+            feature_vector: The feature vector of a package.
+
+        Returns:
+            The future of the predicted label and malicious probability, None if the classifier does not
+            estimate probabilities.
+        """
+        future = Future()
+        self.requests.put((feature_vector, future))
+        return future
+
+    def run(self):
+        """Predict the queued feature vectors in batches, forever."""
+        while True:
+            requests = [self.requests.get()]
+            deadline = time.monotonic() + self.max_batch_delay
+            while len(requests) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                try:
+                    requests.append(self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                labels, probabilities = predict_packages_with_probability(self.model_name, numpy.stack([feature_vector for feature_vector, _ in requests]))
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+            for i, (_, future) in enumerate(requests):
+                future.set_result((str(labels[i]), None if probabilities is None else float(probabilities[i])))
+
+class ScoringRequestHandler(BaseHTTPRequestHandler):
+    """The endpoints of the scoring server.
+
+    - GET /health: the served model.
+    - POST /predict?path=<archive path>: predict a package archive on the local disk.
+    - POST /predict?name=<archive file name>: predict the package archive sent as the request body.
+    - POST /reload: load the model again, e.g. after a new training.
+    """
+    def address_string(self) -> str:
+        # the clients of a unix socket have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'local'
+
+    def send_json(self, status: int, content: dict):
+        """Send a JSON response.
+
+        Args:
+            status: The HTTP status code.
+            content: The response content.
+        """
+        body = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path != '/health':
+            self.send_json(404, {'error': f'Unknown endpoint {self.path}'})
+            return
+        self.send_json(200, {'status': 'ok', 'model': self.server.model_name})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/reload':
+            try:
+                reload_model(self.server.model_name)
+            except Exception as e:
+                traceback.print_exc()
+                self.send_json(500, {'error': f'Reload failed: {e}'})
+                return
+            self.send_json(200, {'status': 'reloaded', 'model': self.server.model_name})
+        elif url.path == '/predict':
+            self.predict(query)
+        else:
+            self.send_json(404, {'error': f'Unknown endpoint {self.path}'})
+
+    def predict(self, query: dict):
+        """Extract the features of a package archive and predict it.
+
+        Args:
+            query: The query parameters, with the path or the file name of the archive.
+        """
+        archive_path = query['path'][0] if 'path' in query else None
+        archive_name = os.path.basename(archive_path) if archive_path else query.get('name', [''])[0]
+        package_name = get_package_name(archive_name)
+        if package_name is None:
+            self.send_json(400, {'error': f'Unsupported archive {archive_name}, use .tar.gz, .tgz or .zip.'})
+            return
+        temp_path = None
+        try:
+            if archive_path is None:
+                temp_path = self.receive_archive(archive_name[len(package_name):])
+                if temp_path is None:
+                    return
+            feature_vector = self.server.executor.submit(extract_archive_vector, archive_path or temp_path, self.server.file_workers).result()
+            label, probability = self.server.batcher.submit(feature_vector).result()
+            self.send_json(200, {'package': package_name, 'prediction': label, 'probability': probability})
+        except ArchiveLimitExceededError as e:
+            self.send_json(422, {'error': f'The package {archive_name} has {e}.'})
+        except FileNotFoundError:
+            self.send_json(404, {'error': f'Package archive {archive_path} not found!'})
+        except Exception as e:
+            print(f'Error: {archive_name}')
+            traceback.print_exc()
+            self.send_json(500, {'error': str(e)})
+        finally:
+            if temp_path is not None:
+                os.remove(temp_path)
+
+    def receive_archive(self, extension: str) -> str:
+        """Save the archive sent as the request body to a temporary file.
+
+        Args:
+            extension: The extension of the archive, which gives its format.
+
+        Returns:
+            The path of the temporary file, or None if the archive is refused.
+        """
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0 or length > self.server.max_request_bytes:
+            self.send_json(413 if length > 0 else 400, {'error': f'The archive must have between 1 and {self.server.max_request_bytes} bytes.'})
+            return None
+        fd, temp_path = tempfile.mkstemp(suffix=extension)
+        with os.fdopen(fd, 'wb') as f:
+            while length > 0:
+                chunk = self.rfile.read(min(length, UPLOAD_CHUNK_SIZE))
+                if not chunk:
+                    break
+                f.write(chunk)
+                length -= len(chunk)
+        # a client which disconnected early sent a truncated archive
+        if length > 0:
+            os.remove(temp_path)
+            self.send_json(400, {'error': 'Incomplete request body.'})
+            return None
+        return temp_path
+
+class ThreadingUnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    """An HTTP server on a unix socket, with a thread per request."""
+    daemon_threads = True
+
+def serve(model_name: str, host: str, port: int, socket_path: str, workers: int, file_workers: int, max_batch_size: int, max_batch_delay: float, max_request_bytes: int):
+    """Serve the predictions of a model over HTTP until interrupted.
+
+    Args:
+        model_name: The model name, MLP, NB, SVM or RF.
+        host: The host to listen on.
+        port: The port to listen on.
+        socket_path: The unix socket to listen on instead of the host and the port, None to use them.
+        workers: Number of worker processes to extract packages with.
+        file_workers: Number of worker processes to analyze the files of a large package with.
+        max_batch_size: The maximum number of packages predicted at once.
+        max_batch_delay: The maximum time to wait for more packages to predict at once, in seconds.
+        max_request_bytes: The maximum size of an archive sent as a request body.
+    """
+    # the model is loaded before the first request
+    reload_model(model_name)
+    if socket_path:
+        if os.path.lexists(socket_path):
+            # only a stale socket is replaced, never another file
+            if not stat.S_ISSOCK(os.lstat(socket_path).st_mode):
+                print(f'Error: {socket_path} exists and is not a socket!')
+                exit(1)
+            os.remove(socket_path)
+        server = ThreadingUnixHTTPServer(socket_path, ScoringRequestHandler)
+        address = socket_path
+    else:
+        server = ThreadingHTTPServer((host, port), ScoringRequestHandler)
+        address = f'http://{host}:{port}'
+    with server, ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver')) as executor:
+        server.model_name = model_name
+        server.executor = executor
+        server.file_workers = file_workers
+        server.max_request_bytes = max_request_bytes
+        server.batcher = MicroBatcher(model_name, max_batch_size, max_batch_delay)
+        print(f'Serving {model_name} on {address}')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    if socket_path and os.path.exists(socket_path):
+        os.remove(socket_path)
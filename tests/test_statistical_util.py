@@ -0,0 +1,44 @@
+import mmap
+
+import pytest
+
+from feature_extract.src.source_util import decode_source_or_utf8
+from feature_extract.src.statistical_util import (
+    COMPRESSION_CHUNK_SIZE,
+    calculate_compression_ratio,
+    calculate_entropy,
+    calculate_statistics
+)
+
+# raw contents of source files, with the edge cases of the entropy and the compression ratio
+BUFFERS = {
+    'empty': b'',
+    'ascii': b'import os\nos.system("ls")\n',
+    'only_spaces': b'    ',
+    'crlf': b'import os\r\nprint("a")\r\n',
+    'utf8': 'name = "café 中文 \U0001f600"\n'.encode('utf-8'),
+    'latin1_cookie': '# -*- coding: latin-1 -*-\nname = "café"\n'.encode('latin-1'),
+    'bogus_cookie': b'# -*- coding: bogus -*-\nx = "\xff\xfe"\n',
+    'large': b''.join(b'line %d = %r\n' % (i, i * 7919 % 104729) for i in range(COMPRESSION_CHUNK_SIZE // 8)),
+}
+
+def test_statistics_of_each_buffer():
+    buffers = list(BUFFERS.values())
+    entropies, compression_ratios = calculate_statistics(buffers)
+    assert entropies.shape == compression_ratios.shape == (len(buffers),)
+    for i, data in enumerate(buffers):
+        assert entropies[i] == pytest.approx(calculate_entropy(decode_source_or_utf8(data)), rel=1e-12)
+        assert compression_ratios[i] == pytest.approx(calculate_compression_ratio(data), rel=1e-12)
+
+def test_statistics_of_mapped_buffer(tmp_path):
+    file_path = tmp_path / 'large.py'
+    file_path.write_bytes(BUFFERS['large'])
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        entropies, compression_ratios = calculate_statistics([data])
+    expected_entropies, expected_compression_ratios = calculate_statistics([BUFFERS['large']])
+    assert entropies.tolist() == expected_entropies.tolist()
+    assert compression_ratios.tolist() == expected_compression_ratios.tolist()
+
+def test_statistics_of_no_buffer():
+    entropies, compression_ratios = calculate_statistics([])
+    assert entropies.shape == compression_ratios.shape == (0,)
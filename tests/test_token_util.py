@@ -0,0 +1,62 @@
+import pytest
+
+from feature_extract.src.ast_util import get_feature_by_content
+from feature_extract.src.token_util import get_feature_by_tokens
+from feature_extract.src.position_recorder import PositionRecorder
+
+# python 3 code which both get_feature_by_content() and get_feature_by_tokens() analyze
+PARITY_CONTENTS = {
+    'imports': 'import os, socket\nfrom subprocess import Popen as P\nimport urllib.request\n',
+    'attribute_calls': 'import os\nos.system("ls")\nos.path.join("a", "b")\nsocket.socket().connect(("1.2.3.4", 80))\n',
+    'eval_exec': 'eval("1 + 1")\nexec("import os")\ncompile("x", "<string>", "exec")\n',
+    'def_and_class': 'def system(command):\n    pass\nclass popen:\n    def eval(self):\n        return open("/etc/passwd")\n',
+    'adjacent_literals': 'url = ("http://evil"\n       ".example.com/payload")\nip = "1.2." "3.4"\n',
+    'f_string_literals': 'import os\nx = f"{os.getcwd()}" "http://evil.example.com"\ny = f"{eval(\'1\')}"\n',
+    'bytes': 'data = b"\\x00\\x01ab"\nmixed = b"ab" b"cd"\n',
+    'base64_payload': 'import base64\nbase64.b64decode("aW1wb3J0IG9zOyBvcy5zeXN0ZW0oImxzIik=")\n',
+    'environment': 'import os\nhome = os.environ["HOME"]\nos.getenv("PATH")\n',
+}
+# python 2 code, which only get_feature_by_tokens() analyzes, with the python 3 code of the same features
+PYTHON2_CONTENTS = {
+    'exec_statement': ('exec "import os"\n', 'exec("import os")\n'),
+    'exec_in_statement': ('import os\nexec code in globals()\n', 'import os\nexec(code, globals())\n'),
+    'print_statement': ('import socket\nprint "host", socket.gethostname()\n', 'import socket\nprint("host", socket.gethostname())\n'),
+    'backticks': ('import os\nx = `os.environ`\nos.system("ls")\n', 'import os\nx = repr(os.environ)\nos.system("ls")\n'),
+}
+
+def extract(get_feature, content: str, is_in_setup_py: bool):
+    """Get the features and the positions of a python code.
+
+    Args:
+        get_feature: get_feature_by_content() or get_feature_by_tokens().
+        content: The python code.
+        is_in_setup_py: Whether the code is in setup.py.
+
+    Returns:
+        The feature and the position recorder.
+    """
+    position_recorder = PositionRecorder()
+    package_feature = get_feature(content, is_in_setup_py, position_recorder, 'test.py')
+    return package_feature, position_recorder
+
+@pytest.mark.parametrize('is_in_setup_py', [True, False])
+@pytest.mark.parametrize('name', PARITY_CONTENTS)
+def test_parity_with_ast(name, is_in_setup_py):
+    content = PARITY_CONTENTS[name]
+    ast_feature, ast_positions = extract(get_feature_by_content, content, is_in_setup_py)
+    token_feature, token_positions = extract(get_feature_by_tokens, content, is_in_setup_py)
+    assert token_feature.get_feature_names() == ast_feature.get_feature_names()
+    assert token_feature.longest_string_length == ast_feature.longest_string_length
+    # the tokens are visited in the order of the code, the ast nodes are not
+    assert {feature_name: sorted(token_positions.get_records(feature_name)) for feature_name in token_positions.positions} == \
+        {feature_name: sorted(ast_positions.get_records(feature_name)) for feature_name in ast_positions.positions}
+
+@pytest.mark.parametrize('is_in_setup_py', [True, False])
+@pytest.mark.parametrize('name', PYTHON2_CONTENTS)
+def test_python2_features(name, is_in_setup_py):
+    python2_content, python3_content = PYTHON2_CONTENTS[name]
+    with pytest.raises(SyntaxError):
+        compile(python2_content, 'test.py', 'exec')
+    ast_feature, _ = extract(get_feature_by_content, python3_content, is_in_setup_py)
+    token_feature, _ = extract(get_feature_by_tokens, python2_content, is_in_setup_py)
+    assert token_feature.get_feature_names() == ast_feature.get_feature_names()
@@ -1,5 +1,7 @@
 from .src.train_classifier import PreprocessMethodEnum, ModelEnum, ActionEnum, train
-from .src.predict import predict_package_MLP, predict_package_NB, predict_package_SVM, predict_package_RF
+from .src.predict import predict_package_MLP, predict_package_NB, predict_package_SVM, predict_package_RF, predict_packages, predict_packages_with_probability
+from .src.model_registry import reload_model
+from .src.read_feature import read_feature_store, iter_feature_batches
 
 __all__ = [
     'PreprocessMethodEnum',
@@ -9,5 +11,10 @@ __all__ = [
     'predict_package_MLP',
     'predict_package_NB',
     'predict_package_SVM',
-    'predict_package_RF'
+    'predict_package_RF',
+    'predict_packages',
+    'predict_packages_with_probability',
+    'reload_model',
+    'read_feature_store',
+    'iter_feature_batches'
 ]
\ No newline at end of file
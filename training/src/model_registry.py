@@ -0,0 +1,99 @@
+import os
+
+from .pickle_util import load_classifier, load_scaler
+from .commons import MLP_path, mlp_scaler_save_path, nb_path, nb_scaler_save_path, svm_scaler_save_path, svm_path, rf_classifier_path
+
+
+# model name -> paths of the classifier and of the scaler, None if the features are not scaled
+MODEL_PATHS = {
+    'MLP': (MLP_path, mlp_scaler_save_path),
+    'NB': (nb_path, nb_scaler_save_path),
+    'SVM': (svm_path, svm_scaler_save_path),
+    'RF': (rf_classifier_path, None),
+}
+
+def get_file_stamp(file_path):
+    """Get the stamp of a file, which changes when the file is written.
+
+    Args:
+        file_path: The path of the file.
+
+    Returns:
+        The mtime, the size and the inode of the file.
+
+    Throws:
+        FileNotFoundError: If the file does not exist.
+    """
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+class ModelRegistry:
+    """The classifiers and the scalers loaded by the current process.
+
+    A model is loaded on its first use and kept, and is loaded again when the file of its classifier or of
+    its scaler changes, e.g. after a new training.
+    """
+    def __init__(self):
+        # model name -> stamps of the files, classifier and scaler
+        self.models = {}
+
+    def get(self, model_name):
+        """Get a model, loaded at most once per version of its files.
+
+        Args:
+            model_name: The model name, MLP, NB, SVM or RF.
+
+        Returns:
+            The classifier and the scaler of the model, None if the features are not scaled.
+
+        Throws:
+            FileNotFoundError: If the model is not saved.
+        """
+        classifier_path, scaler_path = MODEL_PATHS[model_name]
+        stamps = (get_file_stamp(classifier_path), None if scaler_path is None else get_file_stamp(scaler_path))
+        model = self.models.get(model_name)
+        if model is None or model[0] != stamps:
+            model = self.load(model_name)
+        return model[1], model[2]
+
+    def load(self, model_name):
+        """Load a model from its files, and replace the loaded model only once both files are loaded.
+
+        Args:
+            model_name: The model name, MLP, NB, SVM or RF.
+
+        Returns:
+            The stamps of the files, the classifier and the scaler of the model.
+
+        Throws:
+            FileNotFoundError: If the model is not saved.
+        """
+        classifier_path, scaler_path = MODEL_PATHS[model_name]
+        stamps = (get_file_stamp(classifier_path), None if scaler_path is None else get_file_stamp(scaler_path))
+        classifier = load_classifier(classifier_path)
+        scaler = None if scaler_path is None else load_scaler(scaler_path)
+        # the model is replaced by a single assignment, so the users of the model get the old or the new pair
+        model = self.models[model_name] = (stamps, classifier, scaler)
+        return model
+
+# the model registry of the current process
+model_registry = ModelRegistry()
+
+def reload_model(model_name):
+    """Load a model again in the model registry of the current process, even if its files are unchanged.
+
+    Args:
+        model_name: The model name, MLP, NB, SVM or RF.
+    """
+    model_registry.load(model_name)
+
+def get_model(model_name):
+    """Get a model from the model registry of the current process.
+
+    Args:
+        model_name: The model name, MLP, NB, SVM or RF.
+
+    Returns:
+        The classifier and the scaler of the model, None if the features are not scaled.
+    """
+    return model_registry.get(model_name)
@@ -1,17 +1,28 @@
+import os
 import pickle
 
 
+def save_pickle(obj, file_path):
+   """Save an object as a pickle file atomically, so a process loading the file never reads a partial file.
+
+   Args:
+      obj: The object.
+      file_path: The path of the pickle file.
+   """
+   temp_path = f'{file_path}.{os.getpid()}.tmp'
+   with open(temp_path, "wb") as f:
+      pickle.dump(obj, f)
+   os.replace(temp_path, file_path)
+
 def save_classifier(classifier, file_path):
-   with open(file_path, "wb") as f:
-      pickle.dump(classifier, f)
+   save_pickle(classifier, file_path)
 
 def load_classifier(file_path):
    with open(file_path, "rb") as f:
       return pickle.load(f)
 
 def save_scaler(scaler, scaler_save_path):
-   with open(scaler_save_path, "wb") as f:
-      pickle.dump(scaler, f)
+   save_pickle(scaler, scaler_save_path)
 
 def load_scaler(scaler_save_path):
    with open(scaler_save_path, "rb") as f:
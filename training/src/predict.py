@@ -1,6 +1,5 @@
-from .pickle_util import load_classifier, load_scaler
 from .read_feature import read_feature_from_file
-from .commons import MLP_path, rf_scaler_save_path, mlp_scaler_save_path, nb_path,nb_scaler_save_path, svm_scaler_save_path,svm_path, rf_classifier_path
+from .model_registry import get_model
 
 
 def predict_single_package(classifier, feature_vector):
@@ -24,12 +23,7 @@ def predict_package_MLP(feature_file_path):
     Returns:
         The predicted label of the package.
     """
-    classifier = load_classifier(MLP_path)
-    feature_vector = read_feature_from_file(feature_file_path)
-    scaler_path = mlp_scaler_save_path
-    scaler = load_scaler(scaler_path)
-    feature_vector = scaler.transform([feature_vector])
-    return predict_single_package(classifier, feature_vector)[0]
+    return predict_packages('MLP', [read_feature_from_file(feature_file_path)])[0]
 
 def predict_package_NB(feature_file_path):
     """Predict the label of a single package using NB.
@@ -40,12 +34,7 @@ def predict_package_NB(feature_file_path):
     Returns:
         The predicted label of the package.
     """
-    classifier = load_classifier(nb_path)
-    feature_vector = read_feature_from_file(feature_file_path)
-    scaler_path = nb_scaler_save_path
-    scaler = load_scaler(scaler_path)
-    feature_vector = scaler.transform([feature_vector])
-    return predict_single_package(classifier, feature_vector)[0]
+    return predict_packages('NB', [read_feature_from_file(feature_file_path)])[0]
 
 def predict_package_SVM(feature_file_path):
     """Predict the label of a single package using SVM.
@@ -56,12 +45,7 @@ def predict_package_SVM(feature_file_path):
     Returns:
         The predicted label of the package.
     """
-    classifier = load_classifier(svm_path)
-    feature_vector = read_feature_from_file(feature_file_path)
-    scaler_path = svm_scaler_save_path
-    scaler = load_scaler(scaler_path)
-    feature_vector = scaler.transform([feature_vector])
-    return predict_single_package(classifier, feature_vector)[0]
+    return predict_packages('SVM', [read_feature_from_file(feature_file_path)])[0]
 
 def predict_package_RF(feature_file_path):
     """Predict the label of a single package using RF.
@@ -72,10 +56,38 @@ def predict_package_RF(feature_file_path):
     Returns:
         The predicted label of the package.
     """
-    classifier = load_classifier(rf_classifier_path)
-    feature_vector = read_feature_from_file(feature_file_path)
-    feature_vector = [feature_vector]
-    # scaler_path = rf_scaler_save_path
-    # scaler = load_scaler(scaler_path)
-    # feature_vector = scaler.transform([feature_vector])
-    return predict_single_package(classifier, feature_vector)[0]
\ No newline at end of file
+    return predict_packages('RF', [read_feature_from_file(feature_file_path)])[0]
+
+def predict_packages(model_name, feature_matrix):
+    """Predict the labels of packages.
+
+    Args:
+        model_name: The model name, MLP, NB, SVM or RF.
+        feature_matrix: The feature vectors of the packages, see read_feature_store().
+
+    Returns:
+        The predicted labels of the packages.
+    """
+    classifier, scaler = get_model(model_name)
+    if scaler is not None:
+        feature_matrix = scaler.transform(feature_matrix)
+    return list(predict_single_package(classifier, feature_matrix))
+
+def predict_packages_with_probability(model_name, feature_matrix):
+    """Predict the labels of packages and the probabilities that they are malicious, with the same model.
+
+    Args:
+        model_name: The model name, MLP, NB, SVM or RF.
+        feature_matrix: The feature vectors of the packages, see read_feature_store().
+
+    Returns:
+        The predicted labels of the packages, and the probabilities of the malicious label, None if the
+        classifier does not estimate probabilities.
+    """
+    classifier, scaler = get_model(model_name)
+    if scaler is not None:
+        feature_matrix = scaler.transform(feature_matrix)
+    labels = list(predict_single_package(classifier, feature_matrix))
+    if not hasattr(classifier, 'predict_proba'):
+        return labels, None
+    return labels, classifier.predict_proba(feature_matrix)[:, list(classifier.classes_).index('malicious')]
\ No newline at end of file
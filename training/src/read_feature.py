@@ -1,5 +1,8 @@
 import csv
 import os
+import json
+
+import numpy
 
 
 def normalize_feature(value):
@@ -33,6 +36,51 @@ def read_feature_from_file(feature_file_path):
             feature_vector.append(normalize_feature(value))
     return feature_vector
 
+def read_feature_store(feature_dir_path):
+    """Read the feature store of a dataset, written next to its feature files by the extraction.
+
+    Args:
+        feature_dir_path: The path of the directory containing the feature files of the dataset.
+
+    Returns:
+        The package names and the memory-mapped feature matrix with a row per package, or None if the
+        dataset has no feature store.
+    """
+    feature_dir_path = os.path.normpath(feature_dir_path)
+    try:
+        with open(f'{feature_dir_path}.schema.json', 'r') as f:
+            schema = json.load(f)
+        with open(f'{feature_dir_path}.packages.json', 'r') as f:
+            package_names = json.load(f)
+    except (FileNotFoundError, json.decoder.JSONDecodeError):
+        return None
+    shape = (len(package_names), len(schema['columns']))
+    if not package_names:
+        return package_names, numpy.zeros(shape, dtype=schema['dtype'])
+    return package_names, numpy.memmap(f'{feature_dir_path}.matrix', dtype=schema['dtype'], mode='r', shape=shape)
+
+def iter_feature_batches(feature_dir_path, batch_size):
+    """Read the features of a dataset in batches, from its feature store or else from its feature files.
+
+    Args:
+        feature_dir_path: The path of the directory containing the feature files of the dataset.
+        batch_size: The maximum number of packages per batch.
+
+    Yields:
+        The package names and the feature matrix of every batch.
+    """
+    feature_store = read_feature_store(feature_dir_path)
+    if feature_store is not None:
+        package_names, feature_matrix = feature_store
+        for i in range(0, len(package_names), batch_size):
+            yield package_names[i:i + batch_size], feature_matrix[i:i + batch_size]
+        return
+    feature_file_names = [feature_file_name for feature_file_name in os.listdir(feature_dir_path) if feature_file_name.endswith('.csv')]
+    for i in range(0, len(feature_file_names), batch_size):
+        batch_file_names = feature_file_names[i:i + batch_size]
+        feature_vectors = [read_feature_from_file(os.path.join(feature_dir_path, feature_file_name)) for feature_file_name in batch_file_names]
+        yield [feature_file_name[:-4] for feature_file_name in batch_file_names], numpy.asarray(feature_vectors, dtype=numpy.float64)
+
 def read_features(malicous_path, benign_path):
     """Read the features from the directory.
     
@@ -65,6 +113,13 @@ def read_features_from_di(dirPath, feature_arr: list, label_arr: list, isMalicou
     Returns:
         The features and labels.
     """
+    feature_store = read_feature_store(dirPath)
+    if feature_store is not None:
+        package_names, feature_matrix = feature_store
+        feature_file_names += [f'{package_name}.csv' for package_name in package_names]
+        feature_arr += list(feature_matrix)
+        label_arr += ["malicious" if isMalicous else "benign"] * len(package_names)
+        return
     for root, _ , files in os.walk(dirPath):
         for f in files:
             csvPath = os.path.join(root, f)
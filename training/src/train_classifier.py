@@ -2,7 +2,7 @@ from enum import Enum
 
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 
-from .read_feature import read_features
+from .training_matrix import load_training_matrix
 from .train_MLP import train_MLP_validation, save_MLP
 from .train_NB import train_NB_Validate, save_NB
 from .train_RF import train_classifier_RF_Validation, save_RF
@@ -41,16 +41,7 @@ def train(malcious_features_dir_paths: [], normal_features_dir_paths: [], prepro
         hyperparameters: The hyperparameters of the model.
     """
 
-    X_train = []
-    y_train = []
-    for malcious_features_dir_path in malcious_features_dir_paths:
-        [X, y, _] = read_features(malcious_features_dir_path, None)
-        X_train += X
-        y_train += y
-    for normal_features_dir_path in normal_features_dir_paths:
-        [X, y, _] = read_features(None, normal_features_dir_path)
-        X_train += X
-        y_train += y
+    X_train, y_train = load_training_matrix(malcious_features_dir_paths, normal_features_dir_paths)
 
 
     # preprocess
@@ -0,0 +1,111 @@
+import os
+import json
+import hashlib
+
+import numpy
+
+from .read_feature import read_feature_store, read_features
+from conf import SETTINGS
+
+# the version of the cached training matrices, to change with their format
+TRAINING_MATRIX_VERSION = 1
+
+def get_feature_dir_fingerprint(feature_dir_path):
+    """Get the fingerprint of the features of a dataset, which changes with its features.
+
+    Args:
+        feature_dir_path: The path of the directory containing the feature files of the dataset.
+
+    Returns:
+        The schema and the size and mtime of the feature store of the dataset, or the size and mtime of
+        every feature file if the dataset has no feature store.
+    """
+    feature_dir_path = os.path.normpath(feature_dir_path)
+    try:
+        with open(f'{feature_dir_path}.schema.json', 'r') as f:
+            schema = f.read()
+        fingerprint = [schema]
+        for path in (f'{feature_dir_path}.matrix', f'{feature_dir_path}.packages.json'):
+            stat = os.stat(path)
+            fingerprint.append([stat.st_size, stat.st_mtime_ns])
+        return fingerprint
+    except FileNotFoundError:
+        pass
+    fingerprint = []
+    for root, _, files in os.walk(feature_dir_path):
+        for f in sorted(files):
+            stat = os.stat(os.path.join(root, f))
+            fingerprint.append([os.path.relpath(os.path.join(root, f), feature_dir_path), stat.st_size, stat.st_mtime_ns])
+    return sorted(fingerprint)
+
+def build_training_matrix(feature_dir_paths):
+    """Read the features of datasets into one matrix.
+
+    Args:
+        feature_dir_paths: The paths of the directories containing the feature files of the datasets, with
+            whether the samples are malicious.
+
+    Returns:
+        The float32 feature matrix and the labels.
+    """
+    matrices = []
+    labels = []
+    for feature_dir_path, is_malicious in feature_dir_paths:
+        feature_store = read_feature_store(feature_dir_path)
+        if feature_store is not None:
+            package_names, feature_matrix = feature_store
+            matrices.append(numpy.asarray(feature_matrix, dtype=numpy.float32))
+            labels += ["malicious" if is_malicious else "benign"] * len(package_names)
+            continue
+        [X, y, _] = read_features(feature_dir_path, None) if is_malicious else read_features(None, feature_dir_path)
+        if X:
+            matrices.append(numpy.asarray(X, dtype=numpy.float32))
+            labels += y
+    X = numpy.concatenate(matrices) if matrices else numpy.zeros((0, 0), dtype=numpy.float32)
+    return X, numpy.array(labels, dtype='<U9')
+
+def save_array(array, path):
+    """Save an array as a .npy file atomically.
+
+    Args:
+        array: The array.
+        path: The path of the .npy file.
+    """
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as f:
+        numpy.save(f, array)
+    os.replace(temp_path, path)
+
+def load_training_matrix(malcious_features_dir_paths, normal_features_dir_paths):
+    """Load the features of the training datasets as a float32 matrix and a label vector.
+
+    The matrix of a set of datasets is cached as .npy files in the training_cache folder of classifier
+    in the settings, and memory-mapped by the later trainings until the features of a dataset change.
+
+    Args:
+        malcious_features_dir_paths: The paths of the directories containing the malicious sample feature files.
+        normal_features_dir_paths: The paths of the directories containing the benign sample feature files.
+
+    Returns:
+        The feature matrix and the labels, malicious samples first.
+    """
+    feature_dir_paths = [(os.path.abspath(path), True) for path in malcious_features_dir_paths]
+    feature_dir_paths += [(os.path.abspath(path), False) for path in normal_features_dir_paths]
+    cache_dir_path = SETTINGS['classifier']['training_cache']
+    if not cache_dir_path:
+        return build_training_matrix(feature_dir_paths)
+    # the matrices of the same datasets share a prefix, so the outdated ones are removed
+    prefix = hashlib.sha256(json.dumps(feature_dir_paths).encode()).hexdigest()[:16]
+    fingerprint = [TRAINING_MATRIX_VERSION] + [get_feature_dir_fingerprint(path) for path, _ in feature_dir_paths]
+    name = f'{prefix}-{hashlib.sha256(json.dumps(fingerprint).encode()).hexdigest()[:16]}'
+    X_path = os.path.join(cache_dir_path, f'{name}.X.npy')
+    y_path = os.path.join(cache_dir_path, f'{name}.y.npy')
+    if not (os.path.exists(X_path) and os.path.exists(y_path)):
+        X, y = build_training_matrix(feature_dir_paths)
+        os.makedirs(cache_dir_path, exist_ok=True)
+        for file_name in os.listdir(cache_dir_path):
+            if file_name.startswith(f'{prefix}-') and file_name.endswith('.npy'):
+                os.remove(os.path.join(cache_dir_path, file_name))
+        save_array(X, X_path)
+        save_array(y, y_path)
+    return numpy.load(X_path, mmap_mode='r'), numpy.load(y_path, mmap_mode='r')